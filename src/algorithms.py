@@ -1,12 +1,140 @@
+import time
 import chess
 import chess.engine
-from state_eval import evaluate_board
+from bitbase import DRAW, WIN
+from bitbase import probe as probe_bitbase
+from incremental_eval import IncrementalBoard
+from position_cache import PositionStatus, default_position_cache
+from search_stats import SearchStats
+from state_eval import PIECE_VALUES, eval_cache, evaluate_board, evaluation_key
+from transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable, position_key
+
+MAX_SEARCH_DEPTH = 64
+ASPIRATION_WINDOW = 0.5
+# Root moves are searched against the best score minus this margin so that
+# equal scores stay exact and can still be tie-broken.
+TIE_MARGIN = 1e-6
+# Maximum number of captures quiescence search plays beyond the horizon.
+QUIESCENCE_DEPTH = 8
+
+# Move ordering scores: captures by MVV-LVA, then killer moves, then quiet
+# moves by their history score.
+CAPTURE_SCORE = 3_000_000
+KILLER_SCORE = 2_000_000
+DEVELOPMENT_SCORE = 1_000_000
+
+# Selective search methods that can be switched on per search.
+PRUNING_METHODS = ("null_move", "late_move_reductions", "futility")
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+# The null move is reduced one ply more from this depth on.
+NULL_MOVE_DEEP_DEPTH = 6
+# Quiet moves after the first LMR_FULL_DEPTH_MOVES are searched one ply
+# shallower first, at depths of at least LMR_MIN_DEPTH, and two plies
+# shallower after twice as many moves at depths of at least LMR_DEEP_DEPTH.
+LMR_FULL_DEPTH_MOVES = 3
+LMR_MIN_DEPTH = 3
+LMR_DEEP_DEPTH = 5
+# Margin in pawns by remaining depth: quiet moves are skipped when the static
+# evaluation plus the margin cannot reach alpha.
+FUTILITY_MARGINS = {1: 2, 2: 4}
+# In quiescence search, the same switch skips captures that cannot bring the
+# score within this many pawns of the window (delta pruning).
+DELTA_MARGIN = 2
+
+# Score of a position the bitbases report as won, before the mop-up terms
+# that steer the winning side towards mate or promotion.
+BITBASE_WIN_SCORE = 1000
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when its budget runs out or it is told to stop."""
+
+
+class SearchContext:
+    """
+    Budget, counters and move ordering tables shared by every node of one search.
+
+    killers holds the last two quiet moves that caused a beta cutoff at each
+    ply, and history accumulates depth * depth for every quiet cutoff move,
+    indexed by side to move, from square and to square.
+
+    Args:
+        time_limit (float | None): Wall-clock seconds the search may use.
+        node_limit (int | None): Maximum number of nodes to visit.
+        stop_event (threading.Event | None): Stops the search once set.
+        pruning (Iterable[str]): Selective search methods from PRUNING_METHODS to use.
+        position_cache (PositionCache | None): Cache of legal moves and game-over
+            status, defaults to the process-wide default_position_cache.
+        shared_alpha (multiprocessing.Value | None): Best root score found by any
+            process of a parallel search. It is re-read every 64 nodes and
+            raises alpha at every node searched after that (alpha_floor).
+    """
+
+    def __init__(self, time_limit=None, node_limit=None, stop_event=None, pruning=(), position_cache=None, shared_alpha=None):
+        unknown = set(pruning) - set(PRUNING_METHODS)
+        if unknown:
+            raise ValueError(f"Unknown pruning methods {sorted(unknown)}, expected some of {PRUNING_METHODS}.")
+        self.deadline = time.monotonic() + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.stop_event = stop_event
+        self.nodes = 0
+        self.cutoffs = 0
+        self.evaluations = 0
+        self.completed_depth = 0
+        self.killers = {}
+        self.history = [0] * (2 * 64 * 64)
+        self.null_move = "null_move" in pruning
+        self.late_move_reductions = "late_move_reductions" in pruning
+        self.futility = "futility" in pruning
+        self.positions = default_position_cache if position_cache is None else position_cache
+        self.shared_alpha = shared_alpha
+        self.alpha_floor = -float('inf')
+
+    def visit(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchAborted
+        if self.nodes % 64 == 0:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                raise SearchAborted
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise SearchAborted
+            if self.shared_alpha is not None:
+                # Same window as search_root, so scores that can tie stay exact.
+                best_eval = self.shared_alpha.value
+                if best_eval < float('inf'):
+                    self.alpha_floor = best_eval - TIE_MARGIN
+
+    def record_cutoff(self, board, move, depth):
+        """Count a beta cutoff and, for a quiet move, remember it as a killer and in the history."""
+        self.cutoffs += 1
+        if board.is_capture(move) or move.promotion:
+            return
+        ply = len(board.move_stack)
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[board.turn * 4096 + move.from_square * 64 + move.to_square] += depth * depth
+
+
+def evaluate(board):
+    """Static evaluation. Scores of an IncrementalBoard are cached in state_eval.eval_cache."""
+    if isinstance(board, IncrementalBoard):
+        key = evaluation_key(board.zobrist_hash(), len(board.move_stack))
+        value = eval_cache.probe(key)
+        if value is None:
+            value = board.evaluate()
+            eval_cache.store(key, value)
+        return value
+    return evaluate_board(board)
 
 def tie_break_moves(board, moves):
     scored_moves = []
     for move in moves:
         board.push(move)
-        score = evaluate_board(board)
+        score = evaluate(board)
         board.pop()
         scored_moves.append((move, score))
     
@@ -36,68 +164,436 @@ def prioritize_moves(board, moves):
     prioritized_moves = sorted(moves, key=move_priority, reverse=True)
     return prioritized_moves
 
-def order_moves(board, moves):
+def capture_score(board, move):
+    """MVV-LVA: the most valuable victim first, the least valuable attacker first among equal victims."""
+    victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+    return CAPTURE_SCORE + 10 * victim - board.piece_type_at(move.from_square)
+
+
+def order_moves(board, moves, tt_move=None, search=None):
+    """
+    Sort moves best first without playing them: the transposition table move,
+    captures by MVV-LVA, queen promotions, killer moves, and the remaining
+    quiet moves by history score. In the opening, castling and minor piece
+    moves come before other quiet moves.
+    """
+    opening = len(board.move_stack) < 10
+    killers = search.killers.get(len(board.move_stack), ()) if search is not None else ()
+    history = search.history if search is not None else None
+    offset = board.turn * 4096
+
     def move_score(move):
-        priority = 0
-        if len(board.move_stack) < 10:
-            if board.is_castling(move):
-                priority += 10
-            if board.piece_at(move.from_square) in {chess.KNIGHT, chess.BISHOP}:
-                priority += 2
-            if board.is_castling(move):
-                priority += 3 
+        if move == tt_move:
+            return CAPTURE_SCORE * 2
         if board.is_capture(move):
-            priority += 3
+            return capture_score(board, move)
+        if move.promotion == chess.QUEEN:
+            return CAPTURE_SCORE
+        if move in killers:
+            return KILLER_SCORE - killers.index(move)
+        score = history[offset + move.from_square * 64 + move.to_square] if history is not None else 0
+        if opening and (board.is_castling(move) or board.piece_type_at(move.from_square) in (chess.KNIGHT, chess.BISHOP)):
+            score += DEVELOPMENT_SCORE
+        return min(score, KILLER_SCORE - 2)
+
+    return sorted(moves, key=move_score, reverse=True)
+
+
+def quiescence(board, alpha, beta, is_maximizing, search=None, depth=QUIESCENCE_DEPTH):
+    """
+    Search captures only from a horizon node until the position is quiet, so
+    that the static evaluation is not taken in the middle of an exchange. The
+    side to move may always stand pat on the static evaluation.
+
+    With futility pruning switched on, captures that cannot reach the window
+    even after winning the piece, and captures of a defended piece by a more
+    valuable one, are skipped.
+    """
+    if search is not None:
+        search.visit()
+        search.evaluations += 1
+    known = _bitbase_score(board)
+    if known is not None:
+        return known
+    stand_pat = evaluate(board)
+    if depth == 0 or abs(stand_pat) == float('inf'):
+        return stand_pat
+
+    if is_maximizing:
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+    else:
+        if stand_pat <= alpha:
+            return stand_pat
+        beta = min(beta, stand_pat)
+
+    captures = sorted(board.generate_legal_captures(), key=lambda move: capture_score(board, move), reverse=True)
+    prune = search is not None and search.futility
+    value = stand_pat
+    for move in captures:
+        if prune and _futile_capture(board, move, stand_pat, alpha, beta, is_maximizing):
+            continue
         board.push(move)
-        score = 2 if board.is_check() else 0
+        eval = quiescence(board, alpha, beta, not is_maximizing, search, depth - 1)
         board.pop()
-        return priority + score
+        if is_maximizing:
+            value = max(value, eval)
+            alpha = max(alpha, eval)
+        else:
+            value = min(value, eval)
+            beta = min(beta, eval)
+        if beta <= alpha:
+            break
+    return value
 
-    return sorted(moves, key=move_score, reverse=True)
 
-def alpha_beta(board, depth, alpha, beta, is_maximizing):
-    if depth == 0 or board.is_game_over():
-        return evaluate_board(board)
+def alpha_beta(board, depth, alpha, beta, is_maximizing, tt=None, search=None):
+    if search is not None and search.alpha_floor > alpha:
+        # Another process has already found a root move this good, so lines
+        # below it need not be scored exactly.
+        alpha = search.alpha_floor
+        if alpha >= beta:
+            return alpha
+    # A bitbase draw is final. A win is returned as soon as the ending is
+    # entered, by a capture or a pawn move; once inside it, the search goes
+    # on so that it can find the mate, with the leaves scored by the bitbase.
+    known = _bitbase_score(board)
+    if known is not None and (known == 0 or board.halfmove_clock == 0):
+        if search is not None:
+            search.visit()
+            search.evaluations += 1
+        return known
+    if depth <= 0 and not board.is_game_over():
+        return quiescence(board, alpha, beta, is_maximizing, search)
+    if search is not None:
+        search.visit()
+    # Horizon nodes only need is_game_over(), which is cheaper than hashing
+    # the position; interior nodes take their legal moves from the cache.
+    if depth > 0:
+        key = position_key(board)
+        status = search.positions.status(board, key) if search is not None else PositionStatus(board)
+    if depth <= 0 or status.is_game_over(board):
+        if search is not None:
+            search.evaluations += 1
+        return evaluate(board)
+
+    tt_move = None
+    if tt is not None:
+        entry = tt.probe(key)
+        if entry is not None:
+            tt_move = entry.move
+            if entry.depth >= depth:
+                if entry.bound == EXACT:
+                    return entry.score
+                if entry.bound == LOWER_BOUND:
+                    alpha = max(alpha, entry.score)
+                elif entry.bound == UPPER_BOUND:
+                    beta = min(beta, entry.score)
+                if beta <= alpha:
+                    return entry.score
+    original_alpha, original_beta = alpha, beta
+    best_move = None
+
+    in_check = status.in_check
+    static_eval = None
+    futile = False
+    killers = ()
+    if search is not None and not in_check:
+        if search.null_move and depth >= NULL_MOVE_MIN_DEPTH and _null_move_allowed(board):
+            static_eval = _static_eval(board, search)
+            if static_eval >= beta if is_maximizing else static_eval <= alpha:
+                # If passing still fails high, a real move would too. The
+                # bound is returned rather than the score so that a null-move
+                # search never reports a mate.
+                reduced = depth - 1 - NULL_MOVE_REDUCTION - (depth >= NULL_MOVE_DEEP_DEPTH)
+                board.push(chess.Move.null())
+                if is_maximizing:
+                    eval = alpha_beta(board, reduced, beta - TIE_MARGIN, beta, False, tt, search)
+                else:
+                    eval = alpha_beta(board, reduced, alpha, alpha + TIE_MARGIN, True, tt, search)
+                board.pop()
+                if is_maximizing and eval >= beta:
+                    return beta
+                if not is_maximizing and eval <= alpha:
+                    return alpha
+        if search.futility and depth in FUTILITY_MARGINS:
+            if static_eval is None:
+                static_eval = _static_eval(board, search)
+            margin = FUTILITY_MARGINS[depth]
+            futile = static_eval + margin <= alpha if is_maximizing else static_eval - margin >= beta
+        killers = search.killers.get(len(board.move_stack), ())
 
-    legal_moves = order_moves(board, list(board.legal_moves))
+    legal_moves = order_moves(board, list(status.legal_moves), tt_move, search)
 
     if is_maximizing:
         max_eval = -float('inf')
-        for move in legal_moves:
+        for index, move in enumerate(legal_moves):
+            quiet = not in_check and not board.is_capture(move) and not move.promotion and move not in killers
+            if futile and quiet and not status.gives_check(board, move):
+                max_eval = max(max_eval, static_eval)
+                continue
             board.push(move)
-            eval = alpha_beta(board, depth - 1, alpha, beta, not is_maximizing)
+            eval = _search_move(board, index, depth, alpha, beta, True, tt, search, quiet)
             board.pop()
+            if eval > max_eval or best_move is None:
+                best_move = move
             max_eval = max(max_eval, eval)
             alpha = max(alpha, eval)
             if beta <= alpha:
+                if search is not None:
+                    search.record_cutoff(board, move, depth)
                 break
-        return max_eval
+        value = max_eval
     else:
         min_eval = float('inf')
-        for move in board.legal_moves:
+        for index, move in enumerate(legal_moves):
+            quiet = not in_check and not board.is_capture(move) and not move.promotion and move not in killers
+            if futile and quiet and not status.gives_check(board, move):
+                min_eval = min(min_eval, static_eval)
+                continue
             board.push(move)
-            eval = alpha_beta(board, depth - 1, alpha, beta, True)
+            eval = _search_move(board, index, depth, alpha, beta, False, tt, search, quiet)
             board.pop()
+            if eval < min_eval or best_move is None:
+                best_move = move
             min_eval = min(min_eval, eval)
             beta = min(beta, eval)
             if beta <= alpha:
+                if search is not None:
+                    search.record_cutoff(board, move, depth)
                 break
-        return min_eval
+        value = min_eval
 
-def get_best_move_alpha_beta(board, depth):
+    if tt is not None:
+        if value <= original_alpha:
+            bound = UPPER_BOUND
+        elif value >= original_beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        tt.store(key, depth, value, bound, best_move)
+    return value
+
+def _bitbase_score(board):
+    """
+    Exact score of a position covered by the bitbases, or None. Won positions
+    score BITBASE_WIN_SCORE plus a bonus for driving the lone king to the
+    edge, bringing the kings together and advancing the pawn, so that the
+    search makes progress; checkmates are left to the normal evaluation.
+    """
+    if chess.popcount(board.occupied) > 3:
+        return None
+    result = probe_bitbase(board)
+    if result is None or result != WIN and board.is_checkmate():
+        return None
+    if result == DRAW:
+        return 0
+    strong = board.turn if result == WIN else not board.turn
+    weak_king, strong_king = board.king(not strong), board.king(strong)
+    edge = (abs(2 * chess.square_file(weak_king) - 7) + abs(2 * chess.square_rank(weak_king) - 7)) // 2
+    distance = abs(chess.square_file(weak_king) - chess.square_file(strong_king)) + abs(chess.square_rank(weak_king) - chess.square_rank(strong_king))
+    score = BITBASE_WIN_SCORE + edge - distance / 2
+    pawns = board.pawns & board.occupied_co[strong]
+    if pawns:
+        # Kept below the queen and rook terms, so that promoting always pays.
+        rank = chess.square_rank(chess.lsb(pawns))
+        score += (rank if strong == chess.WHITE else 7 - rank) / 4
+    else:
+        score += PIECE_VALUES[chess.QUEEN if board.queens else chess.ROOK]
+    return score if strong == chess.WHITE else -score
+
+
+def _static_eval(board, search):
+    search.evaluations += 1
+    return evaluate(board)
+
+
+def _futile_capture(board, move, stand_pat, alpha, beta, is_maximizing):
+    victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+    gain = PIECE_VALUES[victim] + (PIECE_VALUES[move.promotion] - 1 if move.promotion else 0)
+    if stand_pat + gain + DELTA_MARGIN <= alpha if is_maximizing else stand_pat - gain - DELTA_MARGIN >= beta:
+        return True
+    attacker = board.piece_type_at(move.from_square)
+    return PIECE_VALUES[attacker] > gain and board.is_attacked_by(not board.turn, move.to_square)
+
+
+def _null_move_allowed(board):
+    """
+    No two null moves in a row, and none for a side with only king and pawns,
+    where being forced to move (zugzwang) is common and passing would be
+    misleading.
+    """
+    if board.move_stack and not board.move_stack[-1]:
+        return False
+    return bool(board.occupied_co[board.turn] & ~(board.pawns | board.kings))
+
+
+def _search_move(board, index, depth, alpha, beta, is_maximizing, tt, search, quiet):
+    """
+    Search the move just played on board for the side is_maximizing. With late
+    move reductions, a late quiet move that does not give check is first
+    searched at a reduced depth, and searched again at full depth only if it
+    improves the window.
+    """
+    if (search is not None and search.late_move_reductions and quiet and depth >= LMR_MIN_DEPTH
+            and index >= LMR_FULL_DEPTH_MOVES and not board.is_check()):
+        reduction = 2 if depth >= LMR_DEEP_DEPTH and index >= 2 * LMR_FULL_DEPTH_MOVES else 1
+        eval = alpha_beta(board, depth - 1 - reduction, alpha, beta, not is_maximizing, tt, search)
+        if eval <= alpha if is_maximizing else eval >= beta:
+            return eval
+    return alpha_beta(board, depth - 1, alpha, beta, not is_maximizing, tt, search)
+
+
+def search_root(board, depth, alpha, beta, root_moves, tt=None, search=None):
+    """
+    Search the root moves in the given order and return the best score with
+    every move that reaches it.
+
+    Each move is searched against the best score found so far, so only moves
+    that can match it get an exact score. The loop stops on a fail high.
+    """
     best_eval: float = -float('inf')
     best_moves: list = []
-    
-    for move in board.legal_moves:
+
+    for move in root_moves:
+        floor = best_eval - TIE_MARGIN if best_eval < float('inf') else alpha
         board.push(move)
-        eval = alpha_beta(board, depth - 1, -float('inf'), float('inf'), False)
+        eval = alpha_beta(board, depth - 1, max(alpha, floor), beta, False, tt, search)
         board.pop()
         if eval > best_eval:
             best_eval = eval
             best_moves = [move]
         elif eval == best_eval:
             best_moves.append(move)
-    if len(best_moves) == 1:
-        return best_moves[0]
+        if best_eval >= beta:
+            break
+
+    return best_eval, best_moves
+
+
+def principal_variation(board, tt, max_length=MAX_SEARCH_DEPTH):
+    """Follow best moves stored in the transposition table from this position."""
+    pv = []
+    board = board.copy()
+    seen = set()
+    while len(pv) < max_length:
+        key = position_key(board)
+        entry = tt.probe(key)
+        if key in seen or entry is None or entry.move is None or not board.is_legal(entry.move):
+            break
+        seen.add(key)
+        pv.append(entry.move)
+        board.push(entry.move)
+    return pv
+
+
+def iterative_deepening(board, max_depth, tt, search):
+    """
+    Deepen one ply at a time until max_depth or the search budget runs out and
+    return the best moves of the last completed iteration.
+
+    Each iteration starts with the previous principal variation and, after the
+    first ply, searches inside an aspiration window around the previous score.
+    """
+    legal_moves = list(board.legal_moves)
+    root_moves = order_moves(board, legal_moves)
+    root_ply = len(board.move_stack)
+    best_eval = None
+    best_moves = root_moves[:1]
+
+    for current_depth in range(1, max_depth + 1):
+        pv = principal_variation(board, tt, 1)
+        if pv and pv[0] in root_moves:
+            root_moves.remove(pv[0])
+            root_moves.insert(0, pv[0])
+
+        if best_eval is None or abs(best_eval) == float('inf'):
+            alpha, beta = -float('inf'), float('inf')
+        else:
+            alpha, beta = best_eval - ASPIRATION_WINDOW, best_eval + ASPIRATION_WINDOW
+
+        try:
+            while True:
+                eval, moves = search_root(board, current_depth, alpha, beta, root_moves, tt, search)
+                if eval <= alpha and alpha > -float('inf'):
+                    alpha = -float('inf')
+                elif eval >= beta and beta < float('inf'):
+                    beta = float('inf')
+                    root_moves.remove(moves[0])
+                    root_moves.insert(0, moves[0])
+                else:
+                    break
+        except SearchAborted:
+            while len(board.move_stack) > root_ply:
+                board.pop()
+            break
+
+        best_eval = eval
+        best_moves = sorted(moves, key=legal_moves.index)
+        search.completed_depth = current_depth
+        if abs(best_eval) == float('inf'):
+            break
+
+    return best_moves
+
+
+def get_best_move_alpha_beta(board, depth=None, tt=None, time_limit=None, node_limit=None, stop_event=None, collect_stats=False,
+                             pruning=(), book=None):
+    """
+    Search every root move to the given depth and return the best one.
+
+    Passing the same transposition table on every call lets the search reuse
+    work from earlier moves of the game. If a time_limit (seconds) or
+    node_limit is given, the search deepens one ply at a time up to depth (or
+    without a depth cap) and returns the best move of the last completed
+    iteration once the budget runs out or stop_event is set.
+
+    With collect_stats, a (move, SearchStats) pair is returned instead of the
+    move alone. pruning names the selective search methods to use (see
+    PRUNING_METHODS); without any, the search is full width. If an
+    OpeningBook is given and has a move for the position, that move is
+    returned without searching.
+    """
+    start = time.monotonic()
+    book_move = book.move(board) if book is not None else None
+    if book_move is not None:
+        return _with_stats(book_move, None, start, collect_stats, from_book=True)
+    board = IncrementalBoard.from_board(board)
+    if tt is not None:
+        tt.new_search()
+
+    search = None
+    if time_limit is None and node_limit is None and stop_event is None:
+        if depth is None:
+            raise ValueError("A depth, time_limit or node_limit is required.")
+        search = SearchContext(pruning=pruning)
+        root_moves = order_moves(board, list(board.legal_moves))
+        _, best_moves = search_root(board, depth, -float('inf'), float('inf'), root_moves, tt, search)
+        best_moves.sort(key=list(board.legal_moves).index)
+        search.completed_depth = depth
+    else:
+        legal_moves = list(board.legal_moves)
+        if len(legal_moves) == 1:
+            return _with_stats(legal_moves[0], None, start, collect_stats)
+        if tt is None:
+            tt = TranspositionTable(max_memory_mb=8)
+        search = SearchContext(time_limit=time_limit, node_limit=node_limit, stop_event=stop_event, pruning=pruning)
+        best_moves = iterative_deepening(board, depth or MAX_SEARCH_DEPTH, tt, search)
+
+    move = best_moves[0] if len(best_moves) == 1 else tie_break_moves(board, best_moves)
+    return _with_stats(move, search, start, collect_stats)
+
 
-    return tie_break_moves(board, best_moves)
+def _with_stats(move, search, start, collect_stats, from_book=False):
+    if not collect_stats:
+        return move
+    stats = SearchStats()
+    stats.book = from_book
+    if search is not None:
+        stats.nodes = search.nodes
+        stats.cutoffs = search.cutoffs
+        stats.evaluations = search.evaluations
+        stats.depth = search.completed_depth
+    stats.elapsed = time.monotonic() - start
+    return move, stats
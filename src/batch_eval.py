@@ -0,0 +1,265 @@
+from typing import NamedTuple
+
+import chess
+import numpy as np
+
+from state_eval import PIECE_VALUES
+
+ONGOING = 0
+CHECKMATE = 1
+STALEMATE = 2
+
+_ZERO = np.uint64(0)
+_ONE = np.uint64(1)
+_ALL = np.uint64(chess.BB_ALL)
+
+_FILE_A = np.uint64(chess.BB_FILE_A)
+_FILE_H = np.uint64(chess.BB_FILE_H)
+_FILE_AB = np.uint64(chess.BB_FILE_A | chess.BB_FILE_B)
+_FILE_GH = np.uint64(chess.BB_FILE_G | chess.BB_FILE_H)
+_NOT_A = _ALL ^ _FILE_A
+_NOT_H = _ALL ^ _FILE_H
+_NOT_AB = _ALL ^ _FILE_AB
+_NOT_GH = _ALL ^ _FILE_GH
+
+_CENTER = np.uint64(chess.BB_D4 | chess.BB_E4 | chess.BB_D5 | chess.BB_E5)
+_BACKRANK = {chess.WHITE: np.uint64(chess.BB_RANK_1), chess.BLACK: np.uint64(chess.BB_RANK_8)}
+_UNDEVELOPED = {
+    chess.WHITE: np.uint64(chess.BB_RANK_1 | chess.BB_RANK_2),
+    chess.BLACK: np.uint64(chess.BB_RANK_7 | chess.BB_RANK_8),
+}
+_CASTLED_KING = {
+    chess.WHITE: np.uint64(chess.BB_G1 | chess.BB_C1),
+    chess.BLACK: np.uint64(chess.BB_G8 | chess.BB_C8),
+}
+_RANKS = [np.uint64(mask) for mask in chess.BB_RANKS]
+_FILES = [np.uint64(mask) for mask in chess.BB_FILES]
+_ADJACENT_FILES = [(_FILES[file - 1] if file > 0 else _ZERO) | (_FILES[file + 1] if file < 7 else _ZERO) for file in range(8)]
+_D1 = np.uint64(chess.BB_D1)
+_WHITE_KNIGHT_START = np.uint64(chess.BB_B1 | chess.BB_G1)
+_WHITE_BISHOP_START = np.uint64(chess.BB_C1 | chess.BB_F1)
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+class PackedPositions(NamedTuple):
+    """
+    N positions as bitboard arrays.
+
+    pieces has shape (N, 2, 6) and is indexed by [position, color, piece_type - 1]
+    with chess.BLACK == 0 and chess.WHITE == 1. castling holds the cleaned
+    castling-rights mask, ply the length of the move stack, turn the side to
+    move and status one of ONGOING, CHECKMATE or STALEMATE.
+    """
+    pieces: np.ndarray
+    castling: np.ndarray
+    ply: np.ndarray
+    turn: np.ndarray
+    status: np.ndarray
+
+
+def pack_boards(boards) -> PackedPositions:
+    """Pack chess.Board objects into bitboard arrays for evaluate_packed."""
+    boards = list(boards)
+    pieces = np.array(
+        [[[board.pieces_mask(piece_type, color) for piece_type in chess.PIECE_TYPES] for color in chess.COLORS[::-1]] for board in boards],
+        dtype=np.uint64,
+    ).reshape(len(boards), 2, 6)
+    castling = np.array([board.clean_castling_rights() for board in boards], dtype=np.uint64)
+    ply = np.array([len(board.move_stack) for board in boards], dtype=np.int64)
+    turn = np.array([board.turn for board in boards], dtype=bool)
+    status = np.array(
+        [CHECKMATE if board.is_checkmate() else STALEMATE if board.is_stalemate() else ONGOING for board in boards],
+        dtype=np.int8,
+    )
+    return PackedPositions(pieces, castling, ply, turn, status)
+
+
+def popcount(bitboards: np.ndarray) -> np.ndarray:
+    """Count set bits of every uint64 in the array."""
+    x = bitboards - ((bitboards >> _ONE) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return ((x * _H01) >> np.uint64(56)).astype(np.int64)
+
+
+def _shift(bitboards, offset, mask):
+    if offset > 0:
+        return (bitboards << np.uint64(offset)) & mask
+    return (bitboards >> np.uint64(-offset)) & mask
+
+
+_KING_STEPS = [(8, _ALL), (-8, _ALL), (1, _NOT_A), (-1, _NOT_H), (9, _NOT_A), (7, _NOT_H), (-7, _NOT_A), (-9, _NOT_H)]
+_KNIGHT_STEPS = [(17, _NOT_A), (15, _NOT_H), (10, _NOT_AB), (6, _NOT_GH), (-17, _NOT_H), (-15, _NOT_A), (-10, _NOT_GH), (-6, _NOT_AB)]
+_ROOK_STEPS = _KING_STEPS[:4]
+_BISHOP_STEPS = _KING_STEPS[4:]
+
+
+def _leaper_attacks(bitboards, steps):
+    """Attack set and summed per-piece attack counts for knights or kings."""
+    attacks = np.zeros_like(bitboards)
+    count = np.zeros(bitboards.shape, dtype=np.int64)
+    for offset, mask in steps:
+        targets = _shift(bitboards, offset, mask)
+        attacks |= targets
+        count += popcount(targets)
+    return attacks, count
+
+
+def _slider_attacks(bitboards, empty, steps):
+    """
+    Attack set and summed per-piece attack counts for sliding pieces.
+
+    Every ray is advanced one square at a time and stops after the first
+    occupied square. Rays of different pieces in the same direction never
+    share a square, so counting the front of each step counts each piece's
+    attacks exactly like len(board.attacks(square)).
+    """
+    attacks = np.zeros_like(bitboards)
+    count = np.zeros(bitboards.shape, dtype=np.int64)
+    for offset, mask in steps:
+        front = _shift(bitboards, offset, mask)
+        for _ in range(7):
+            attacks |= front
+            count += popcount(front)
+            front = _shift(front & empty, offset, mask)
+    return attacks, count
+
+
+def _side_terms(pieces, color, empty):
+    pawns, knights, bishops, rooks, queens, kings = (pieces[:, int(color), index] for index in range(6))
+    pawn_attacks = _pawn_attacks(pawns, color)
+    knight_attacks, knight_count = _leaper_attacks(knights, _KNIGHT_STEPS)
+    king_attacks, king_count = _leaper_attacks(kings, _KING_STEPS)
+    diagonal_attacks, diagonal_count = _slider_attacks(bishops | queens, empty, _BISHOP_STEPS)
+    straight_attacks, straight_count = _slider_attacks(rooks | queens, empty, _ROOK_STEPS)
+    attacks = pawn_attacks | knight_attacks | king_attacks | diagonal_attacks | straight_attacks
+
+    occupied = pawns | knights | bishops | rooks | queens | kings
+    own_center = occupied & _CENTER
+    central_control = 0.5 * popcount(own_center) + 0.1 * popcount(attacks & _CENTER & ~own_center)
+
+    development = 0.3 * popcount((knights | bishops) & ~_UNDEVELOPED[color])
+    activity = (knight_count + diagonal_count + straight_count) * 0.1
+
+    if color == chess.WHITE:
+        ranks = range(8)
+    else:
+        ranks = range(7, -1, -1)
+    advancement = sum(rank * popcount(pawns & _RANKS[square_rank]) for rank, square_rank in zip(range(8), ranks))
+
+    # evaluate_king_safety compares a Piece with a piece type, so it never
+    # counts a pawn and always applies the penalty once the king has castled.
+    king_safety = np.where((kings & _CASTLED_KING[color]) != _ZERO, -0.5, 0.0)
+
+    return {
+        "central_control": central_control,
+        "development": development,
+        "activity": activity,
+        "king_safety": king_safety,
+        "king_activity": king_count * 0.1,
+        "pawn_advancement": advancement * 0.1,
+    }
+
+
+def _pawn_attacks(pawns, color):
+    if color == chess.WHITE:
+        return _shift(pawns, 9, _NOT_A) | _shift(pawns, 7, _NOT_H)
+    return _shift(pawns, -7, _NOT_A) | _shift(pawns, -9, _NOT_H)
+
+
+def _pawn_structure(pieces, color):
+    """state_eval.evaluate_positional_heuristics: isolated and backward pawns."""
+    pawns = pieces[:, int(color), 0]
+    all_pawns = pawns | pieces[:, int(not color), 0]
+    isolated = np.zeros(len(pieces), dtype=np.int64)
+    for file in range(8):
+        lonely = (pawns & _ADJACENT_FILES[file]) == _ZERO
+        isolated += np.where(lonely, popcount(pawns & _FILES[file]), 0)
+
+    # A pawn is backward without a friendly pawn beside it, unless its advance
+    # square is free of pawns and not attacked by an enemy pawn.
+    beside = _shift(pawns, 1, _NOT_A) | _shift(pawns, -1, _NOT_H)
+    candidates = pawns & ~beside
+    enemy_attacks = _pawn_attacks(pieces[:, int(not color), 0], not color)
+    if color == chess.WHITE:
+        advance = _shift(candidates, 8, _ALL) & ~all_pawns & ~enemy_attacks
+        free = _shift(advance, -8, _ALL)
+    else:
+        advance = _shift(candidates, -8, _ALL) & ~all_pawns & ~enemy_attacks
+        free = _shift(advance, 8, _ALL)
+    backward = popcount(candidates & ~free)
+    return -0.3 * isolated - 0.05 * backward
+
+
+def _castling_terms(pieces, castling, color):
+    kings = pieces[:, int(color), 5] & _BACKRANK[color]
+    rights = castling & _BACKRANK[color]
+    has_king = kings != _ZERO
+    kingside = has_king & ((rights & ~((kings << _ONE) - _ONE)) != _ZERO)
+    queenside = has_king & ((rights & (kings - _ONE)) != _ZERO)
+    return 0.5 * kingside + 0.5 * queenside
+
+
+def _early_queen_move_penalty(pieces, ply):
+    white = int(chess.WHITE)
+    queens = pieces[:, white, 4]
+    first_queen = queens & (~queens + _ONE)
+    moved = (queens != _ZERO) & (first_queen != _D1) & (ply <= 10)
+    knights_moved = (pieces[:, white, 1] & ~_WHITE_KNIGHT_START) != _ZERO
+    bishops_moved = (pieces[:, white, 2] & ~_WHITE_BISHOP_START) != _ZERO
+    penalty = np.where(knights_moved & bishops_moved, -0.2, -0.7 * (6 - ply) / 6)
+    return np.where(moved, penalty, 0.0)
+
+
+def evaluate_packed(packed: PackedPositions) -> np.ndarray:
+    """
+    Score every packed position with the evaluate_board heuristics.
+
+    Returns a float64 array of white-relative scores. Results match
+    evaluate_board up to floating-point rounding.
+    """
+    pieces = packed.pieces
+    occupied = np.bitwise_or.reduce(pieces.reshape(len(pieces), 12), axis=1)
+    empty = ~occupied
+    white = _side_terms(pieces, chess.WHITE, empty)
+    black = _side_terms(pieces, chess.BLACK, empty)
+
+    material = np.zeros(len(pieces), dtype=np.float64)
+    for piece_type, piece_value in PIECE_VALUES.items():
+        counts = popcount(pieces[:, :, piece_type - 1])
+        material += piece_value * (counts[:, int(chess.WHITE)] - counts[:, int(chess.BLACK)])
+    material = np.where(packed.status == STALEMATE, 0.0, material)
+    material = np.where(packed.status == CHECKMATE, np.where(packed.turn, -np.inf, np.inf), material)
+
+    opening = (
+        material
+        + (white["central_control"] - black["central_control"]) * 0.3
+        + (white["development"] - black["development"]) * 0.4
+        + _early_queen_move_penalty(pieces, packed.ply)
+    )
+    middlegame = (
+        material
+        + (white["central_control"] - black["central_control"]) * 0.2
+        + (white["activity"] - black["activity"]) * 0.3
+        + (white["king_safety"] - black["king_safety"]) * 0.3
+    )
+    endgame = (
+        material
+        + (white["king_activity"] - black["king_activity"]) * 0.3
+        + (white["pawn_advancement"] - black["pawn_advancement"]) * 0.4
+    )
+    pawn_structure = _pawn_structure(pieces, chess.WHITE) - _pawn_structure(pieces, chess.BLACK)
+    value = np.where(packed.ply < 10, opening, np.where(packed.ply < 30, middlegame + pawn_structure, endgame + pawn_structure))
+
+    value += _castling_terms(pieces, packed.castling, chess.WHITE) + _castling_terms(pieces, packed.castling, chess.BLACK)
+    value += white["king_safety"] - black["king_safety"]
+    return value
+
+
+def evaluate_boards(boards) -> np.ndarray:
+    """Score a sequence of chess.Board objects in one vectorized pass."""
+    return evaluate_packed(pack_boards(boards))
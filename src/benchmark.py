@@ -0,0 +1,259 @@
+"""
+Reproducible performance benchmark for evaluation, alpha-beta, MCTS and Lc0.
+
+Every benchmark runs over the positions of a PGN file with seeded randomness,
+and Lc0 is replaced by the deterministic stub_engine.py, so two runs on the
+same machine measure the same work. Timings are the best of several rounds
+to filter out noise from the rest of the system. Results are written as JSON
+and can be compared against a stored baseline; a metric that is worse than
+the baseline by more than the threshold is reported as a regression and makes
+the command exit with status 1.
+
+Usage:
+    python benchmark.py [--output results.json] [--baseline baseline.json] [--threshold 0.15]
+    python benchmark.py --save-baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import chess
+import chess.engine
+import chess.pgn
+from algorithms import PRUNING_METHODS, SearchContext, search_root
+from batch_eval import evaluate_boards
+from engine_pool import EnginePool
+from incremental_eval import IncrementalBoard
+from lc0_eval import default_cache, get_lc0_move_evaluations, get_lc0_multipv_evaluations
+from monte_carlo import MCTS
+from position_cache import default_position_cache
+from state_eval import eval_cache, evaluate_board, pawn_hash
+from transposition import TranspositionTable
+
+DEFAULT_POSITIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_positions.pgn")
+STUB_ENGINE = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_engine.py")]
+
+# Whether a larger value of a metric is an improvement, by metric name suffix.
+HIGHER_IS_BETTER = ("_per_sec",)
+
+
+def load_positions(path: str) -> list[tuple[str, chess.Board]]:
+    """
+    Read the benchmark positions from a PGN or EPD file (by extension). A PGN
+    position is the end of a game's mainline, named by its Event header, and
+    keeps its move history, which selects the evaluation stage. EPD positions
+    have no history and are always evaluated as openings.
+    """
+    positions = []
+    if path.lower().endswith(".epd"):
+        with open(path) as epd_file:
+            for line in epd_file:
+                if line.strip():
+                    board, operations = chess.Board.from_epd(line)
+                    positions.append((operations.get("id", board.fen()), board))
+        return positions
+    with open(path) as pgn_file:
+        while (game := chess.pgn.read_game(pgn_file)) is not None:
+            board = game.end().board()
+            positions.append((game.headers.get("Event", board.fen()), board))
+    return positions
+
+
+def best_time(rounds, function, *args):
+    """Shortest wall-clock time of rounds calls of function(*args)."""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_evaluation(positions, repeat, rounds):
+    boards = [board for _, board in positions] * repeat
+    single = best_time(rounds, lambda: [evaluate_board(board) for board in boards])
+    batched = best_time(rounds, evaluate_boards, boards)
+    return {
+        "evaluate_board.evals_per_sec": len(boards) / single,
+        "evaluate_boards.evals_per_sec": len(boards) / batched,
+    }
+
+
+def clear_caches():
+    """Empty the process-wide caches, so that every round starts cold like the first."""
+    eval_cache.clear()
+    pawn_hash.clear()
+    default_position_cache.clear()
+    default_cache.clear()
+
+
+def bench_alpha_beta(positions, depth, rounds, pruning=()):
+    nodes = 0
+    elapsed = 0.0
+    time_to_depth = [0.0] * depth
+    for _, position in positions:
+        board = IncrementalBoard.from_board(position)
+        legal_moves = list(board.legal_moves)
+        if not legal_moves:
+            continue
+        best = None
+        for _ in range(rounds):
+            clear_caches()
+            tt = TranspositionTable(max_memory_mb=16)
+            search = SearchContext(pruning=pruning)
+            times = []
+            start = time.perf_counter()
+            for current_depth in range(1, depth + 1):
+                search_root(board, current_depth, -float('inf'), float('inf'), legal_moves, tt, search)
+                times.append(time.perf_counter() - start)
+            if best is None or times[-1] < best[-1]:
+                best = times
+        time_to_depth = [total + seconds for total, seconds in zip(time_to_depth, best)]
+        elapsed += best[-1]
+        nodes += search.nodes
+
+    metrics = {"alpha_beta.nodes_per_sec": nodes / elapsed, "alpha_beta.nodes": nodes}
+    for current_depth, seconds in enumerate(time_to_depth, start=1):
+        metrics[f"alpha_beta.time_to_depth_{current_depth}_sec"] = seconds
+    return metrics
+
+
+def bench_mcts(positions, engine, simulations, seed, rounds):
+    def run_all(measure_memory):
+        clear_caches()
+        total_time = 0.0
+        peak = 0
+        for _, board in positions:
+            if board.is_game_over():
+                continue
+            random.seed(seed)
+            if measure_memory:
+                tracemalloc.start()
+            with MCTS(board, simulations, engine, max_depth=35) as mcts:
+                start = time.perf_counter()
+                mcts.run()
+                total_time += time.perf_counter() - start
+            if measure_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+        return total_time, peak
+
+    # tracemalloc slows Python down several times, so time and memory are
+    # measured in separate passes.
+    total_time = min(run_all(False)[0] for _ in range(rounds))
+    _, peak = run_all(True)
+    runs = sum(1 for _, board in positions if not board.is_game_over())
+    return {
+        "mcts.simulations_per_sec": runs * simulations / total_time,
+        "mcts.peak_memory_bytes": peak,
+    }
+
+
+def bench_lc0(positions, engine, rounds):
+    metrics = {}
+    boards = [board for _, board in positions if not board.is_game_over()]
+    # The first requests pay for the engine warming up. The uncached
+    # functions are timed, so every round really queries the engine.
+    get_lc0_multipv_evaluations(engine, boards[0].fen(), boards[0].turn == chess.BLACK)
+    for name, evaluate in (("multipv", get_lc0_multipv_evaluations), ("per_move", get_lc0_move_evaluations)):
+        latencies = []
+        for board in boards:
+            seconds = best_time(rounds, evaluate, engine, board.fen(), board.turn == chess.BLACK)
+            latencies.append(seconds * 1000)
+        metrics[f"lc0.{name}_latency_ms"] = statistics.mean(latencies)
+        metrics[f"lc0.{name}_latency_p95_ms"] = statistics.quantiles(latencies, n=20)[-1]
+    return metrics
+
+
+def run_benchmarks(positions, depth=3, simulations=200, repeat=20, seed=1, rounds=3, pruning=()):
+    random.seed(seed)
+    metrics = {}
+    metrics.update(bench_evaluation(positions, repeat, rounds))
+    metrics.update(bench_alpha_beta(positions, depth, rounds, pruning))
+    with EnginePool(STUB_ENGINE) as engine:
+        metrics.update(bench_mcts(positions, engine, simulations, seed, rounds))
+        metrics.update(bench_lc0(positions, engine, rounds))
+    return metrics
+
+
+def compare(metrics: dict, baseline: dict, threshold: float) -> list[str]:
+    """Names of the metrics that are worse than the baseline by more than threshold."""
+    regressions = []
+    for name, value in metrics.items():
+        reference = baseline.get(name)
+        if not reference or name == "alpha_beta.nodes":
+            continue
+        change = value / reference - 1
+        higher_is_better = name.endswith(HIGHER_IS_BETTER)
+        worse = -change if higher_is_better else change
+        status = "REGRESSION" if worse > threshold else "ok"
+        if worse > threshold:
+            regressions.append(name)
+        print(f"{name:45s} {reference:14.3f} -> {value:14.3f} ({change:+.1%}) {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark evaluation, search and MCTS throughput.")
+    parser.add_argument("--positions", default=DEFAULT_POSITIONS, help="PGN or EPD file with the benchmark positions")
+    parser.add_argument("--depth", type=int, default=3, help="alpha-beta search depth")
+    parser.add_argument("--pruning", nargs="*", default=[], choices=PRUNING_METHODS, help="selective search methods for alpha-beta")
+    parser.add_argument("--simulations", type=int, default=200, help="MCTS simulations per position")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the positions for evaluation")
+    parser.add_argument("--rounds", type=int, default=3, help="timing rounds; the best one is kept")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline")
+    parser.add_argument("--baseline", help="compare against this baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown per metric")
+    args = parser.parse_args()
+
+    positions = load_positions(args.positions)
+    metrics = run_benchmarks(positions, args.depth, args.simulations, args.repeat, args.seed, args.rounds, args.pruning)
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "positions": os.path.basename(args.positions),
+            "depth": args.depth,
+            "pruning": args.pruning,
+            "simulations": args.simulations,
+            "repeat": args.repeat,
+            "rounds": args.rounds,
+            "seed": args.seed,
+        },
+        "metrics": metrics,
+    }
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as json_file:
+                json.dump(results, json_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as json_file:
+            baseline = json.load(json_file)
+        settings = {"depth": args.depth, "simulations": args.simulations, "pruning": args.pruning}
+        if any(baseline["meta"].get(name, []) != value for name, value in settings.items()):
+            print("Warning: the baseline was run with different settings.")
+        if baseline["metrics"].get("alpha_beta.nodes") != metrics["alpha_beta.nodes"]:
+            print("Note: alpha-beta visited a different number of nodes than the baseline, so the search itself changed.")
+        regressions = compare(metrics, baseline["metrics"], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        for name, value in metrics.items():
+            print(f"{name:45s} {value:14.3f}")
+
+
+if __name__ == "__main__":
+    main()
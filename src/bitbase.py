@@ -0,0 +1,250 @@
+"""
+Win/draw bitbases for king and one piece against a lone king (KQK, KRK, KPK).
+
+The tables are built locally by retrograde analysis and stored bit-packed,
+one bit per position, in BITBASE_DIR. In these endings the lone king can
+never win, so one bit (does the stronger side win?) is enough for each side
+to move. Files are memory-mapped on first probe.
+
+Positions are indexed with the stronger side as White; positions where Black
+is the stronger side are mirrored vertically.
+
+Usage: python bitbase.py [--directory DIR]
+"""
+import argparse
+import mmap
+import os
+from collections import deque
+
+import chess
+
+ENDINGS = {"KQK": chess.QUEEN, "KRK": chess.ROOK, "KPK": chess.PAWN}
+POSITIONS = 64 * 64 * 64
+TABLE_BYTES = POSITIONS // 8
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+_KING_MOVES = [list(chess.scan_forward(chess.BB_KING_ATTACKS[square])) for square in chess.SQUARES]
+
+
+def _index(strong_king, weak_king, piece):
+    return (strong_king * 64 + weak_king) * 64 + piece
+
+
+def _attacks(piece_type, square, occupied):
+    if piece_type == chess.PAWN:
+        return chess.BB_PAWN_ATTACKS[chess.WHITE][square]
+    attacks = chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+    attacks |= chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]
+    if piece_type == chess.QUEEN:
+        attacks |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    return attacks
+
+
+def _valid(piece_type, strong_king, weak_king, piece):
+    """Whether the pieces can stand on these squares: all distinct, kings apart, pawns off the last ranks."""
+    if len({strong_king, weak_king, piece}) < 3 or weak_king in _KING_MOVES[strong_king]:
+        return False
+    return piece_type != chess.PAWN or 8 <= piece < 56
+
+
+def _in_check(piece_type, strong_king, weak_king, piece):
+    occupied = chess.BB_SQUARES[strong_king] | chess.BB_SQUARES[weak_king]
+    return bool(_attacks(piece_type, piece, occupied) & chess.BB_SQUARES[weak_king])
+
+
+def _weak_moves(piece_type, strong_king, weak_king, piece):
+    """Legal moves of the lone king; capturing the piece is yielded as None."""
+    guarded = chess.BB_KING_ATTACKS[strong_king]
+    for target in _KING_MOVES[weak_king]:
+        if chess.BB_SQUARES[target] & guarded:
+            continue
+        if target == piece:
+            yield None
+        elif not _attacks(piece_type, piece, chess.BB_SQUARES[strong_king]) & chess.BB_SQUARES[target]:
+            yield target
+
+
+def _strong_unmoves(piece_type, strong_king, weak_king, piece):
+    """Positions with the stronger side to move that lead here by one of its moves."""
+    occupied = chess.BB_SQUARES[strong_king] | chess.BB_SQUARES[weak_king] | chess.BB_SQUARES[piece]
+    for origin in _KING_MOVES[strong_king]:
+        if not chess.BB_SQUARES[origin] & occupied and weak_king not in _KING_MOVES[origin]:
+            yield origin, piece
+    if piece_type == chess.PAWN:
+        if piece >= 16 and not chess.BB_SQUARES[piece - 8] & occupied:
+            yield strong_king, piece - 8
+            if 24 <= piece < 32 and not chess.BB_SQUARES[piece - 16] & occupied:
+                yield strong_king, piece - 16
+    else:
+        for origin in chess.scan_forward(_attacks(piece_type, piece, occupied) & ~occupied):
+            yield strong_king, origin
+
+
+def generate(piece_type, promotions=None) -> tuple[bytearray, bytearray]:
+    """
+    Solve an ending by retrograde analysis and return the bit-packed tables
+    (stronger side to move wins, lone king to move loses).
+
+    Every lone-king position starts with a count of its legal moves. Starting
+    from the checkmates, each position newly won for the stronger side
+    decrements the counts of the positions the lone king could have come
+    from; a count reaching zero means every escape loses, and the stronger
+    side's moves into that position are wins in turn. For KPK, promotions
+    are looked up in the solved KQK and KRK tables given as promotions.
+    """
+    strong_wins = bytearray(POSITIONS)
+    weak_loses = bytearray(POSITIONS)
+    escapes = bytearray(POSITIONS)
+    won = deque()
+
+    for strong_king in chess.SQUARES:
+        for weak_king in chess.SQUARES:
+            for piece in chess.SQUARES:
+                if not _valid(piece_type, strong_king, weak_king, piece):
+                    continue
+                index = _index(strong_king, weak_king, piece)
+                escapes[index] = sum(1 for _ in _weak_moves(piece_type, strong_king, weak_king, piece))
+                if not escapes[index] and _in_check(piece_type, strong_king, weak_king, piece):
+                    weak_loses[index] = 1
+                    won.extend((origin_king, weak_king, origin_piece)
+                               for origin_king, origin_piece in _strong_unmoves(piece_type, strong_king, weak_king, piece))
+                if (promotions and piece >= 48 and piece + 8 not in (strong_king, weak_king)
+                        and any(probe_table(table, strong_king, weak_king, piece + 8, False) for table in promotions)):
+                    won.append((strong_king, weak_king, piece))
+
+    # Positions with the stronger side to move that have a winning move.
+    while won:
+        strong_king, weak_king, piece = won.popleft()
+        if not _valid(piece_type, strong_king, weak_king, piece) or _in_check(piece_type, strong_king, weak_king, piece):
+            continue
+        index = _index(strong_king, weak_king, piece)
+        if strong_wins[index]:
+            continue
+        strong_wins[index] = 1
+        for origin in _KING_MOVES[weak_king]:
+            if not _valid(piece_type, strong_king, origin, piece):
+                continue
+            previous = _index(strong_king, origin, piece)
+            if weak_loses[previous] or not escapes[previous]:
+                continue
+            escapes[previous] -= 1
+            if not escapes[previous]:
+                weak_loses[previous] = 1
+                won.extend((origin_king, origin, origin_piece)
+                           for origin_king, origin_piece in _strong_unmoves(piece_type, strong_king, origin, piece))
+
+    return _pack(strong_wins), _pack(weak_loses)
+
+
+def _pack(values) -> bytearray:
+    packed = bytearray(TABLE_BYTES)
+    for index, value in enumerate(values):
+        if value:
+            packed[index >> 3] |= 1 << (index & 7)
+    return packed
+
+
+def probe_table(table, strong_king, weak_king, piece, strong_to_move) -> bool:
+    """Whether the stronger side wins, from a table as written by generate_all."""
+    index = _index(strong_king, weak_king, piece) + (0 if strong_to_move else POSITIONS)
+    return bool(table[index >> 3] >> (index & 7) & 1)
+
+
+def generate_all(directory: str) -> None:
+    """Generate every ending into directory as {name}.bb, KQK and KRK first since KPK promotes into them."""
+    os.makedirs(directory, exist_ok=True)
+    solved = {}
+    for name, piece_type in ENDINGS.items():
+        promotions = [solved["KQK"], solved["KRK"]] if piece_type == chess.PAWN else None
+        strong_wins, weak_loses = generate(piece_type, promotions)
+        solved[name] = strong_wins + weak_loses
+        path = os.path.join(directory, f"{name}.bb")
+        with open(path + ".tmp", "wb") as table_file:
+            table_file.write(solved[name])
+        os.replace(path + ".tmp", path)
+
+
+class Bitbases:
+    """
+    Memory-mapped bitbases in a directory; endings without a file are not probed.
+
+    Args:
+        directory (str): Directory with the {name}.bb files.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.tables = {}
+        self._files = []
+        for name, piece_type in ENDINGS.items():
+            path = os.path.join(directory, f"{name}.bb")
+            if os.path.exists(path) and os.path.getsize(path) == 2 * TABLE_BYTES:
+                table_file = open(path, "rb")
+                self._files.append(table_file)
+                self.tables[piece_type] = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def probe(self, board: chess.Board) -> int | None:
+        """
+        WIN, DRAW or LOSS for the side to move, or None if the position is not
+        covered: other material, castling rights, or a missing table.
+        """
+        if chess.popcount(board.occupied) != 3 or board.castling_rights:
+            return None
+        for piece_type, table in self.tables.items():
+            pieces = board.pieces_mask(piece_type, chess.WHITE) | board.pieces_mask(piece_type, chess.BLACK)
+            if not pieces:
+                continue
+            strong = chess.WHITE if pieces & board.occupied_co[chess.WHITE] else chess.BLACK
+            strong_king, weak_king, piece = board.king(strong), board.king(not strong), chess.lsb(pieces)
+            if strong == chess.BLACK:
+                strong_king, weak_king, piece = (chess.square_mirror(square) for square in (strong_king, weak_king, piece))
+            strong_to_move = board.turn == strong
+            if not probe_table(table, strong_king, weak_king, piece, strong_to_move):
+                return DRAW
+            return WIN if strong_to_move else LOSS
+        return None
+
+    def close(self) -> None:
+        for table in self.tables.values():
+            table.close()
+        for table_file in self._files:
+            table_file.close()
+        self.tables = {}
+        self._files = []
+
+
+_default = None
+
+
+def default_bitbases() -> Bitbases | None:
+    """Bitbases in BITBASE_DIR, opened on first use; None if the variable is not set."""
+    global _default
+    if _default is None:
+        directory = os.getenv("BITBASE_DIR")
+        if not directory:
+            return None
+        _default = Bitbases(directory)
+    return _default
+
+
+def probe(board: chess.Board) -> int | None:
+    """Probe the BITBASE_DIR bitbases; see Bitbases.probe."""
+    bitbases = default_bitbases()
+    return bitbases.probe(board) if bitbases is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the KQK, KRK and KPK bitbases.")
+    parser.add_argument("--directory", default=os.getenv("BITBASE_DIR"), help="output directory (default: BITBASE_DIR)")
+    args = parser.parse_args()
+    if args.directory is None:
+        parser.error("--directory is required when BITBASE_DIR is not set")
+    generate_all(args.directory)
+    print(f"Bitbases written to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
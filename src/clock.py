@@ -0,0 +1,59 @@
+import time
+
+import chess
+
+
+class GameClock:
+    """
+    Chess clock for both players with a base time and a Fischer increment.
+
+    The side to move calls start() before thinking and stop() after moving;
+    stop() charges the elapsed time and then adds the increment. budget()
+    hands out the thinking time for the next move.
+
+    Args:
+        base_time (float): Seconds each player starts with.
+        increment (float): Seconds added after every move.
+        moves_to_go (int): Number of moves the remaining time is spread over.
+        safety_margin (float): Seconds never handed out, to absorb the
+            overhead between a search stopping and the move being played.
+    """
+
+    def __init__(self, base_time: float, increment: float = 0.0, moves_to_go: int = 30, safety_margin: float = 0.05):
+        self.base_time = base_time
+        self.increment = increment
+        self.moves_to_go = moves_to_go
+        self.safety_margin = safety_margin
+        self.remaining = {chess.WHITE: float(base_time), chess.BLACK: float(base_time)}
+        self._running = None
+        self._started_at = None
+
+    def budget(self, color: chess.Color) -> float:
+        """Seconds the player may spend on the next move."""
+        remaining = self.remaining[color]
+        budget = remaining / self.moves_to_go + self.increment
+        return max(0.0, min(budget, remaining - self.safety_margin))
+
+    def start(self, color: chess.Color) -> None:
+        self._running = color
+        self._started_at = time.monotonic()
+
+    def stop(self) -> float:
+        """Stop the running side's clock and return the seconds it used."""
+        if self._running is None:
+            raise RuntimeError("The clock is not running.")
+        elapsed = time.monotonic() - self._started_at
+        self.remaining[self._running] -= elapsed
+        if self.remaining[self._running] > 0:
+            self.remaining[self._running] += self.increment
+        self._running = None
+        return elapsed
+
+    def flagged(self, color: chess.Color) -> bool:
+        """Whether the player has run out of time."""
+        return self.remaining[color] <= 0
+
+    @property
+    def time_control(self) -> str:
+        """PGN TimeControl tag, e.g. "300+2"."""
+        return f"{self.base_time:g}+{self.increment:g}"
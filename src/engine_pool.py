@@ -0,0 +1,181 @@
+import asyncio
+import threading
+
+import chess
+import chess.engine
+
+# Errors after which an engine process is considered broken and replaced.
+ENGINE_FAILURES = (asyncio.TimeoutError, chess.engine.EngineError, chess.engine.EngineTerminatedError)
+
+
+class _EngineSlot:
+    __slots__ = ("transport", "protocol")
+
+    def __init__(self):
+        self.transport = None
+        self.protocol = None
+
+    @property
+    def alive(self) -> bool:
+        return self.protocol is not None and not self.protocol.returncode.done()
+
+
+class EnginePool:
+    """
+    Pool of warm UCI engine processes driven by python-chess's asyncio API.
+
+    The engines run on an event loop in a background thread. Every analyse
+    request goes to whichever engine is free and is given `timeout` seconds.
+    An engine that times out, crashes or reports an error is killed and
+    respawned, and the request is retried on the next free engine. With a
+    health_interval, idle engines are also pinged periodically and replaced if
+    they do not answer.
+
+    analyse() has the same signature and result as SimpleEngine.analyse, so a
+    pool can be passed anywhere an engine is expected (lc0_eval, MCTS).
+    analyse_many() spreads several positions over the engines concurrently.
+
+    Args:
+        command (str | list[str]): Engine command line, as for popen_uci.
+        size (int): Number of engine processes.
+        timeout (float): Seconds allowed per request before the engine is replaced.
+        options (dict | None): UCI options configured on every engine.
+        retries (int): Number of times a failed request is retried.
+        health_interval (float | None): Seconds between pings of idle engines.
+    """
+
+    def __init__(self, command, size=1, timeout=30.0, options=None, retries=2, health_interval=None):
+        self.command = command
+        self.size = size
+        self.timeout = timeout
+        self.options = options or {}
+        self.retries = retries
+        self.health_interval = health_interval
+        self.restarts = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._slots = []
+        self._idle = None
+        self._health_task = None
+        try:
+            self._call(self._start())
+        except BaseException:
+            self.close()
+            raise
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _start(self):
+        self._idle = asyncio.Queue()
+        self._slots = [_EngineSlot() for _ in range(self.size)]
+        await asyncio.gather(*(self._spawn(slot) for slot in self._slots))
+        for slot in self._slots:
+            self._idle.put_nowait(slot)
+        if self.health_interval is not None:
+            self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def _spawn(self, slot):
+        slot.transport, slot.protocol = await chess.engine.popen_uci(self.command)
+        if self.options:
+            await slot.protocol.configure(self.options)
+
+    async def _kill(self, slot):
+        """Kill the engine process and wait until python-chess has seen it exit."""
+        if slot.transport is not None:
+            slot.transport.close()
+            await asyncio.shield(slot.protocol.returncode)
+        slot.transport = slot.protocol = None
+
+    async def _run(self, slot, coroutine):
+        """
+        Await an engine command with the pool timeout. A command that times out
+        is not cancelled, which python-chess does not expect; the engine is
+        killed instead, which fails the command.
+        """
+        task = asyncio.ensure_future(coroutine)
+        done, _ = await asyncio.wait({task}, timeout=self.timeout)
+        if not done:
+            await self._kill(slot)
+            await asyncio.wait({task})
+            task.exception()  # retrieved, so asyncio does not log it as unhandled
+            raise asyncio.TimeoutError
+        return task.result()
+
+    async def _checkout(self):
+        """Take a free engine, respawning it first if its process has died."""
+        slot = await self._idle.get()
+        if not slot.alive:
+            try:
+                await self._kill(slot)
+                self.restarts += 1
+                await self._spawn(slot)
+            except BaseException:
+                self._idle.put_nowait(slot)
+                raise
+        return slot
+
+    async def _analyse(self, board, limit, kwargs):
+        error = None
+        for _ in range(self.retries + 1):
+            slot = await self._checkout()
+            try:
+                return await self._run(slot, slot.protocol.analyse(board, limit, **kwargs))
+            except ENGINE_FAILURES as exc:
+                error = exc
+                await self._kill(slot)
+            finally:
+                self._idle.put_nowait(slot)
+        raise error
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for _ in range(self.size):
+                slot = await self._checkout()
+                try:
+                    await self._run(slot, slot.protocol.ping())
+                except ENGINE_FAILURES:
+                    await self._kill(slot)
+                finally:
+                    self._idle.put_nowait(slot)
+
+    def analyse(self, board: chess.Board, limit: chess.engine.Limit, **kwargs):
+        return self._call(self._analyse(board.copy(), limit, kwargs))
+
+    def analyse_many(self, boards, limit: chess.engine.Limit, **kwargs) -> list:
+        """Analyse the positions concurrently and return the results in order."""
+        async def analyse_all():
+            return await asyncio.gather(*(self._analyse(board.copy(), limit, kwargs) for board in boards))
+        return self._call(analyse_all())
+
+    def close(self) -> None:
+        if not self._loop.is_running():
+            return
+
+        async def shutdown():
+            if self._health_task is not None:
+                self._health_task.cancel()
+            for slot in self._slots:
+                if slot.alive:
+                    try:
+                        await self._run(slot, slot.protocol.quit())
+                    except ENGINE_FAILURES:
+                        pass
+                await self._kill(slot)
+
+        self._call(shutdown())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def quit(self) -> None:
+        """Alias of close(), matching SimpleEngine."""
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,394 @@
+"""
+Binary game records, a compact alternative to one PGN file per game.
+
+A store is two files: the records in PATH and the byte offset of every
+record in PATH.idx. PATH starts with a magic number and a format version.
+Each record is a fixed-size header (round, date and end time, result,
+termination, search parameters, time control and number of plies) followed
+by the moves, 16 bits each (see move_encoding.py), and, if the game was
+played on a clock, the time spent and the time left after every move in
+milliseconds. Games start from the standard position; the search statistics
+in the PGN comments are not stored.
+
+GameReader memory-maps both files, so counting results or walking openings
+over many games only unpacks the fields that are used; nothing is parsed
+as text. Records are converted back to PGN on demand.
+
+Usage:
+    python game_store.py import GAMES.grec game_1.pgn [game_2.pgn ...]
+    python game_store.py export GAMES.grec OUTPUT.pgn
+"""
+import argparse
+import mmap
+import os
+import struct
+
+import chess
+import chess.pgn
+from move_encoding import decode_move, encode_move
+
+EXTENSION = ".grec"
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+# Stored by index, so new values may only be appended.
+TERMINATIONS = (
+    "Unterminated",
+    "TIME_FORFEIT",
+    "CHECKMATE",
+    "STALEMATE",
+    "INSUFFICIENT_MATERIAL",
+    "SEVENTYFIVE_MOVES",
+    "FIVEFOLD_REPETITION",
+    "FIFTY_MOVES",
+    "THREEFOLD_REPETITION",
+    "VARIANT_WIN",
+    "VARIANT_LOSS",
+    "VARIANT_DRAW",
+)
+MAGIC = b"GREC"
+FORMAT_VERSION = 1
+
+# round, date (YYYYMMDD), end time (seconds since midnight + 1, 0 if
+# unknown), result, termination, alpha-beta depth, flags, MCTS simulations,
+# MCTS max depth, plies, time control base and increment (ms).
+_HEADER = struct.Struct("<IIIBBBBIHHII")
+# Magic number and format version at the start of the record file.
+_FILE_HEADER = struct.Struct("<4sI")
+_OFFSET = struct.Struct("<Q")
+_HAS_TIMINGS = 1
+
+# Headers that are the same for every game main.py plays.
+_FIXED_HEADERS = {
+    "Event": "AI vs AI Match",
+    "Site": "Terminal Simulation",
+    "White": "AlphaBetaPruningAI",
+    "Black": "MonteCarloAI",
+    "WhiteElo": "?",
+    "BlackElo": "?",
+}
+
+
+def _int_header(headers, name) -> int:
+    value = headers.get(name, "")
+    return int(value) if value.isdigit() else 0
+
+
+def _end_time(value: str) -> int:
+    try:
+        hours, minutes, seconds = (int(part) for part in value.strip().split(":"))
+    except ValueError:
+        return 0
+    return hours * 3600 + minutes * 60 + seconds + 1
+
+
+def _time_control(value: str) -> tuple[int, int]:
+    """(base, increment) in milliseconds of a "300+2" tag; (0, 0) if there is no clock."""
+    try:
+        base, increment = value.split("+")
+        return round(float(base) * 1000), round(float(increment) * 1000)
+    except ValueError:
+        return 0, 0
+
+
+def encode_game(game: chess.pgn.Game) -> bytes:
+    """Binary record of a game as returned by main.play_game."""
+    if game.board().fen() != chess.STARTING_FEN:
+        raise ValueError("Only games from the standard starting position can be stored.")
+    headers = game.headers
+    moves = []
+    emts = []
+    clocks = []
+    for node in game.mainline():
+        moves.append(encode_move(node.move))
+        emts.append(node.emt())
+        clocks.append(node.clock())
+    has_timings = bool(moves) and None not in emts and None not in clocks
+
+    date = headers.get("Date", "").replace(".", "")
+    result = headers.get("Result", "*")
+    termination = headers.get("Termination", "Unterminated")
+    header = _HEADER.pack(
+        _int_header(headers, "Round"),
+        int(date) if date.isdigit() else 0,
+        _end_time(headers.get("EndTime", "")),
+        RESULTS.index(result) if result in RESULTS else 0,
+        TERMINATIONS.index(termination) if termination in TERMINATIONS else 0,
+        _int_header(headers, "AlphaBetaDepth"),
+        _HAS_TIMINGS if has_timings else 0,
+        _int_header(headers, "MCTSSimulations"),
+        _int_header(headers, "MCTSMaxDepth"),
+        len(moves),
+        *_time_control(headers.get("TimeControl", "?")),
+    )
+    record = header + struct.pack(f"<{len(moves)}H", *moves)
+    if has_timings:
+        # The clock of a player who lost on time is negative; it is kept at zero.
+        record += struct.pack(f"<{2 * len(moves)}I", *(max(0, round(seconds * 1000)) for seconds in emts + clocks))
+    return record
+
+
+def _check_file_header(data, path: str) -> None:
+    if len(data) < _FILE_HEADER.size or data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a game store.")
+    version = _FILE_HEADER.unpack_from(data)[1]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}.")
+
+
+def _record_size(header_values) -> int:
+    plies, flags = header_values[9], header_values[6]
+    return _HEADER.size + 2 * plies + (8 * plies if flags & _HAS_TIMINGS else 0)
+
+
+class GameWriter:
+    """
+    Appends games to a store, creating it if needed.
+
+    A record is written and synced before its offset is added to the index,
+    so a store is never left pointing at a partial record. Bytes after the
+    last indexed record, left by an interrupted write, are cut off on open.
+
+    Args:
+        path (str): Record file; the index is path + ".idx".
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + ".idx"
+        self._recover()
+        self.records = open(path, "ab")
+        self.index = open(self.index_path, "ab")
+        if self.records.tell() == 0:
+            self.records.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+            self.records.flush()
+            os.fsync(self.records.fileno())
+
+    def _recover(self) -> None:
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        index_size -= index_size % _OFFSET.size
+        end = 0
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= _FILE_HEADER.size:
+            with open(self.path, "rb") as records_file:
+                _check_file_header(records_file.read(_FILE_HEADER.size), self.path)
+            end = _FILE_HEADER.size
+        if index_size:
+            with open(self.index_path, "rb") as index_file:
+                index_file.seek(index_size - _OFFSET.size)
+                offset = _OFFSET.unpack(index_file.read(_OFFSET.size))[0]
+            with open(self.path, "rb") as records_file:
+                records_file.seek(offset)
+                end = offset + _record_size(_HEADER.unpack(records_file.read(_HEADER.size)))
+        for path, size in ((self.path, end), (self.index_path, index_size)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def append(self, game: chess.pgn.Game) -> None:
+        self.append_encoded(encode_game(game))
+
+    def append_encoded(self, record: bytes) -> None:
+        """Append a record made by encode_game, for example in another process."""
+        offset = self.records.tell()
+        self.records.write(record)
+        self.records.flush()
+        os.fsync(self.records.fileno())
+        self.index.write(_OFFSET.pack(offset))
+        self.index.flush()
+        os.fsync(self.index.fileno())
+
+    def close(self) -> None:
+        self.records.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameRecord:
+    """
+    One stored game. The header fields are unpacked when the record is read;
+    moves and timings only when asked for.
+    """
+
+    __slots__ = ("round", "date", "end_time", "result", "termination", "alpha_beta_depth", "mcts_simulations", "mcts_max_depth", "plies",
+                 "time_base", "time_increment", "has_timings", "_data", "_offset")
+
+    def __init__(self, data, offset: int):
+        (self.round, self.date, self.end_time, result, termination, self.alpha_beta_depth, flags, self.mcts_simulations,
+         self.mcts_max_depth, self.plies, self.time_base, self.time_increment) = _HEADER.unpack_from(data, offset)
+        self.result = RESULTS[result]
+        self.termination = TERMINATIONS[termination]
+        self.has_timings = bool(flags & _HAS_TIMINGS)
+        self._data = data
+        self._offset = offset + _HEADER.size
+
+    @property
+    def time_control(self) -> str:
+        if not self.time_base:
+            return "?"
+        return f"{self.time_base / 1000:g}+{self.time_increment / 1000:g}"
+
+    def move_codes(self, max_plies: int | None = None) -> tuple:
+        """The 16-bit move codes, optionally only the first max_plies, e.g. as opening keys."""
+        count = self.plies if max_plies is None else min(self.plies, max_plies)
+        return struct.unpack_from(f"<{count}H", self._data, self._offset)
+
+    def moves(self) -> list[chess.Move]:
+        return [decode_move(code) for code in self.move_codes()]
+
+    def timings(self) -> tuple[tuple, tuple] | None:
+        """(seconds spent on each move, seconds left after it), or None without a clock."""
+        if not self.has_timings:
+            return None
+        values = struct.unpack_from(f"<{2 * self.plies}I", self._data, self._offset + 2 * self.plies)
+        return tuple(ms / 1000 for ms in values[:self.plies]), tuple(ms / 1000 for ms in values[self.plies:])
+
+    def board(self) -> chess.Board:
+        """The final position."""
+        board = chess.Board()
+        for move in self.moves():
+            board.push(move)
+        return board
+
+    def to_pgn(self) -> chess.pgn.Game:
+        game = chess.pgn.Game()
+        game.headers.update(_FIXED_HEADERS)
+        if self.date:
+            game.headers["Date"] = f"{self.date // 10000:04d}.{self.date // 100 % 100:02d}.{self.date % 100:02d}"
+        game.headers["Round"] = str(self.round)
+        game.headers["Result"] = self.result
+        game.headers["TimeControl"] = self.time_control
+        if self.end_time:
+            seconds = self.end_time - 1
+            game.headers["EndTime"] = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+        game.headers["Termination"] = self.termination
+        game.headers["AlphaBetaDepth"] = str(self.alpha_beta_depth or "?")
+        game.headers["MCTSSimulations"] = str(self.mcts_simulations or "?")
+        game.headers["MCTSMaxDepth"] = str(self.mcts_max_depth)
+
+        timings = self.timings()
+        node = game
+        for ply, move in enumerate(self.moves()):
+            node = node.add_main_variation(move)
+            if timings is not None:
+                node.set_clock(timings[1][ply])
+                node.set_emt(timings[0][ply])
+        return game
+
+
+class GameReader:
+    """
+    Memory-mapped read access to a store written by GameWriter.
+
+    Args:
+        path (str): Record file; the index is path + ".idx".
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._files = []
+        self.records = self._map(path)
+        self.index = self._map(path + ".idx")
+        try:
+            _check_file_header(self.records[:_FILE_HEADER.size], path)
+        except ValueError:
+            self.close()
+            raise
+        self._count = len(self.index) // _OFFSET.size
+
+    def _map(self, path):
+        map_file = open(path, "rb")
+        self._files.append(map_file)
+        if os.fstat(map_file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(map_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, number: int) -> GameRecord:
+        if not -self._count <= number < self._count:
+            raise IndexError(number)
+        offset = _OFFSET.unpack_from(self.index, (number % self._count) * _OFFSET.size)[0]
+        return GameRecord(self.records, offset)
+
+    def __iter__(self):
+        for number in range(self._count):
+            yield self[number]
+
+    def filter(self, result: str | None = None, termination: str | None = None, predicate=None):
+        """Yield the games with the given result and termination for which predicate(record) holds."""
+        for record in self:
+            if result is not None and record.result != result:
+                continue
+            if termination is not None and record.termination != termination:
+                continue
+            if predicate is None or predicate(record):
+                yield record
+
+    def rounds(self) -> set[int]:
+        return {record.round for record in self}
+
+    def close(self) -> None:
+        for mapping in (self.records, self.index):
+            if isinstance(mapping, mmap.mmap):
+                mapping.close()
+        for map_file in self._files:
+            map_file.close()
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def stored_rounds(path: str) -> set[int]:
+    """Round numbers of the games in a store; empty if it does not exist yet."""
+    if not os.path.exists(path) or not os.path.exists(path + ".idx"):
+        return set()
+    with GameReader(path) as reader:
+        return reader.rounds()
+
+
+def export_pgn(path: str, pgn_path: str) -> int:
+    """Write every game of a store to a PGN file and return the number of games."""
+    with GameReader(path) as reader, open(pgn_path, "w") as pgn_file:
+        for record in reader:
+            print(record.to_pgn(), file=pgn_file, end="\n\n")
+        return len(reader)
+
+
+def import_pgn(path: str, pgn_paths) -> int:
+    """Append the games of PGN files to a store and return the number of games."""
+    count = 0
+    with GameWriter(path) as writer:
+        for pgn_path in pgn_paths:
+            with open(pgn_path) as pgn_file:
+                while (game := chess.pgn.read_game(pgn_file)) is not None:
+                    writer.append(game)
+                    count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert games between PGN and binary game records.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write a store as PGN")
+    export_parser.add_argument("store")
+    export_parser.add_argument("output")
+    import_parser = commands.add_parser("import", help="append PGN games to a store")
+    import_parser.add_argument("store")
+    import_parser.add_argument("pgn", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"{export_pgn(args.store, args.output)} games written to {args.output}")
+    else:
+        print(f"{import_pgn(args.store, args.pgn)} games added to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import chess
+import chess.polyglot
+from state_eval import (
+    PIECE_VALUES,
+    evaluate_activity,
+    evaluate_castling,
+    evaluate_central_control,
+    evaluate_early_queen_move_penalty,
+    evaluate_king_safety,
+    evaluate_pawn_structure,
+)
+
+MATERIAL = 0
+DEVELOPED = 1  # + color
+ADVANCEMENT = 3  # + color
+KING_MOVES = 5  # + color
+# Zobrist keys of the piece placement and of the pawns alone (see
+# state_eval.pawn_key), updated by XOR instead of addition.
+PIECES_KEY = 7
+PAWN_KEY = 8
+
+# evaluate_piece_development adds 0.3 once per developed piece; summing the
+# same way keeps scores identical to the full recomputation.
+_DEVELOPMENT_SCORES = [0]
+for _ in range(20):
+    _DEVELOPMENT_SCORES.append(_DEVELOPMENT_SCORES[-1] + 0.3)
+
+
+def _square_terms(color, piece_type, square):
+    rank = chess.square_rank(square)
+    terms = []
+    if PIECE_VALUES[piece_type]:
+        terms.append((MATERIAL, PIECE_VALUES[piece_type] if color == chess.WHITE else -PIECE_VALUES[piece_type]))
+    if piece_type in (chess.KNIGHT, chess.BISHOP):
+        if rank > 1 if color == chess.WHITE else rank < 6:
+            terms.append((DEVELOPED + color, 1))
+    elif piece_type == chess.PAWN:
+        terms.append((ADVANCEMENT + color, rank if color == chess.WHITE else 7 - rank))
+    elif piece_type == chess.KING:
+        terms.append((KING_MOVES + color, chess.popcount(chess.BB_KING_ATTACKS[square])))
+    return tuple(terms)
+
+
+_SQUARE_TERMS = {
+    color: {
+        piece_type: [_square_terms(color, piece_type, square) for square in chess.SQUARES]
+        for piece_type in chess.PIECE_TYPES
+    }
+    for color in chess.COLORS
+}
+
+# Polyglot random numbers of each piece on each square, as in chess.polyglot.ZobristHasher.hash_board.
+_SQUARE_KEYS = {
+    color: {
+        piece_type: chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color):][:64]
+        for piece_type in chess.PIECE_TYPES
+    }
+    for color in chess.COLORS
+}
+_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+class IncrementalBoard(chess.Board):
+    """
+    Board that keeps the placement-only evaluation terms up to date on push and
+    pop instead of rescanning every piece at each leaf.
+
+    Material, knight/bishop development, pawn advancement and king activity are
+    updated by delta from the squares a move changes. Terms that depend on
+    attacks or castling are still computed on demand with the state_eval
+    functions, so evaluate() returns exactly what evaluate_board() would.
+
+    The piece part of the Zobrist hash is kept up to date the same way, so
+    zobrist_hash() is much cheaper than chess.polyglot.zobrist_hash(). So is
+    the pawn-only key under which the pawn structure score is cached.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._terms = [0] * 9
+        self._terms_placement = None
+        self._terms_stack = []
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def from_board(cls, board: chess.Board) -> "IncrementalBoard":
+        """Copy a board, including its move stack, into an IncrementalBoard."""
+        if isinstance(board, cls):
+            return board.copy()
+        incremental = cls(board.root().fen(), chess960=board.chess960)
+        for move in board.move_stack:
+            incremental.push(move)
+        return incremental
+
+    def _placement(self):
+        return (self.pawns, self.knights, self.bishops, self.rooks, self.queens, self.kings, self.occupied_co[chess.WHITE])
+
+    def _refresh(self, placement):
+        self._terms = [0] * 9
+        for square, piece in self.piece_map().items():
+            for index, delta in _SQUARE_TERMS[piece.color][piece.piece_type][square]:
+                self._terms[index] += delta
+            self._terms[PIECES_KEY] ^= _SQUARE_KEYS[piece.color][piece.piece_type][square]
+            if piece.piece_type == chess.PAWN:
+                self._terms[PAWN_KEY] ^= _SQUARE_KEYS[piece.color][chess.PAWN][square]
+        self._terms_placement = placement
+
+    def _apply_diff(self, before, after):
+        terms = self._terms
+        old_white, new_white = before[6], after[6]
+        for piece_type, old, new in zip(chess.PIECE_TYPES, before, after):
+            # A capturing promotion can leave a piece bitboard unchanged and
+            # only flip the colour of one square.
+            if old == new and old & old_white == new & new_white:
+                continue
+            for color, old_mask, new_mask in (
+                (chess.WHITE, old & old_white, new & new_white),
+                (chess.BLACK, old & ~old_white, new & ~new_white),
+            ):
+                table = _SQUARE_TERMS[color][piece_type]
+                keys = _SQUARE_KEYS[color][piece_type]
+                for square in chess.scan_forward(old_mask & ~new_mask):
+                    for index, delta in table[square]:
+                        terms[index] -= delta
+                    terms[PIECES_KEY] ^= keys[square]
+                    if piece_type == chess.PAWN:
+                        terms[PAWN_KEY] ^= keys[square]
+                for square in chess.scan_forward(new_mask & ~old_mask):
+                    for index, delta in table[square]:
+                        terms[index] += delta
+                    terms[PIECES_KEY] ^= keys[square]
+                    if piece_type == chess.PAWN:
+                        terms[PAWN_KEY] ^= keys[square]
+        self._terms_placement = after
+
+    def push(self, move: chess.Move) -> None:
+        before = self._placement()
+        if self._terms_placement != before:
+            self._refresh(before)
+        self._terms_stack.append(tuple(self._terms))
+        super().push(move)
+        self._apply_diff(before, self._placement())
+
+    def pop(self) -> chess.Move:
+        move = super().pop()
+        if self._terms_stack:
+            self._terms = list(self._terms_stack.pop())
+            self._terms_placement = self._placement()
+        else:
+            self._terms_placement = None
+        return move
+
+    def zobrist_hash(self) -> int:
+        """Same value as chess.polyglot.zobrist_hash(self)."""
+        placement = self._placement()
+        if self._terms_placement != placement:
+            self._refresh(placement)
+        return self._terms[PIECES_KEY] ^ _HASHER.hash_castling(self) ^ _HASHER.hash_ep_square(self) ^ _HASHER.hash_turn(self)
+
+    def pawn_key(self) -> int:
+        """Same value as state_eval.pawn_key(self)."""
+        placement = self._placement()
+        if self._terms_placement != placement:
+            self._refresh(placement)
+        return self._terms[PAWN_KEY]
+
+    def _evaluate_material(self) -> int | float:
+        if self.is_checkmate():
+            return -float('inf') if self.turn == chess.WHITE else float('inf')
+        if self.is_stalemate():
+            return 0
+        return self._terms[MATERIAL]
+
+    def evaluate(self) -> int | float:
+        """Evaluate the board state; mirrors state_eval.evaluate_board."""
+        placement = self._placement()
+        if self._terms_placement != placement:
+            self._refresh(placement)
+        terms = self._terms
+        move_count = len(self.move_stack)
+
+        if move_count < 10:
+            value = self._evaluate_material()
+            value += evaluate_central_control(self, chess.WHITE) * 0.3
+            value -= evaluate_central_control(self, chess.BLACK) * 0.3
+            value += _DEVELOPMENT_SCORES[terms[DEVELOPED + chess.WHITE]] * 0.4
+            value -= _DEVELOPMENT_SCORES[terms[DEVELOPED + chess.BLACK]] * 0.4
+            value += evaluate_early_queen_move_penalty(self, chess.WHITE)
+        elif move_count < 30:
+            value = self._evaluate_material()
+            value += evaluate_central_control(self, chess.WHITE) * 0.2
+            value -= evaluate_central_control(self, chess.BLACK) * 0.2
+            value += evaluate_activity(self, chess.WHITE) * 0.3
+            value -= evaluate_activity(self, chess.BLACK) * 0.3
+            value += evaluate_king_safety(self, chess.WHITE) * 0.3
+            value -= evaluate_king_safety(self, chess.BLACK) * 0.3
+            value += evaluate_pawn_structure(self, terms[PAWN_KEY])
+        else:
+            value = self._evaluate_material()
+            value += terms[KING_MOVES + chess.WHITE] * 0.1 * 0.3
+            value -= terms[KING_MOVES + chess.BLACK] * 0.1 * 0.3
+            value += terms[ADVANCEMENT + chess.WHITE] * 0.1 * 0.4
+            value -= terms[ADVANCEMENT + chess.BLACK] * 0.1 * 0.4
+            value += evaluate_pawn_structure(self, terms[PAWN_KEY])
+
+        value += evaluate_castling(self)
+        value += evaluate_king_safety(self, chess.WHITE)
+        value -= evaluate_king_safety(self, chess.BLACK)
+        return value
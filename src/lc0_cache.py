@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import chess
+
+# Rough footprint of a cached position (key tuple, dict and LRU links) and of
+# each move in it (Move object, score and dict slot), used to turn a memory
+# cap into evictions. A MultiPV entry for 30 legal moves is about 5 KB.
+ENTRY_SIZE_BYTES = 320
+MOVE_SIZE_BYTES = 160
+
+
+def _entry_size(evaluations: dict) -> int:
+    return ENTRY_SIZE_BYTES + MOVE_SIZE_BYTES * len(evaluations)
+
+
+def _signed(key: int) -> int:
+    """Map an unsigned 64-bit hash onto SQLite's signed INTEGER range."""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+class Lc0Cache:
+    """
+    Bounded cache of per-move Lc0 evaluations.
+
+    Entries are keyed by (zobrist hash, depth, is_black, multipv) and kept in
+    memory with LRU eviction once their estimated size exceeds max_memory_mb.
+    Entries hold one score per legal move, so their size varies with the
+    position. If a path is given, every entry is also written to an SQLite
+    file, and entries evicted from memory or created by earlier runs are read
+    back from it.
+
+    Args:
+        max_memory_mb (float): Approximate memory cap for the entries kept in memory.
+        path (str | None): Optional SQLite file backing the cache.
+        commit_interval (int): Number of new entries buffered before they are
+            written to disk in one transaction.
+    """
+
+    def __init__(self, max_memory_mb: float = 64, path: str | None = None, commit_interval: int = 64):
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.memory = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.commit_interval = commit_interval
+        self._pending_rows = []
+        self._lock = threading.Lock()
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            # WAL lets several processes, e.g. tournament workers, share the file.
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                "zobrist INTEGER, depth INTEGER, is_black INTEGER, multipv INTEGER, moves TEXT, "
+                "PRIMARY KEY (zobrist, depth, is_black, multipv))"
+            )
+            self.db.commit()
+
+    def get(self, key: tuple) -> dict | None:
+        with self._lock:
+            evaluations = self.entries.get(key)
+            if evaluations is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return evaluations
+
+            if self.db is not None:
+                zobrist, depth, is_black, multipv = key
+                row = self.db.execute(
+                    "SELECT moves FROM evaluations WHERE zobrist = ? AND depth = ? AND is_black = ? AND multipv = ?",
+                    (_signed(zobrist), depth, int(is_black), int(multipv)),
+                ).fetchone()
+                if row is not None:
+                    evaluations = {chess.Move.from_uci(uci): score for uci, score in json.loads(row[0])}
+                    self._remember(key, evaluations)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return evaluations
+
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, evaluations: dict) -> None:
+        with self._lock:
+            self._remember(key, evaluations)
+            if self.db is not None:
+                zobrist, depth, is_black, multipv = key
+                self._pending_rows.append(
+                    (_signed(zobrist), depth, int(is_black), int(multipv), json.dumps([[move.uci(), score] for move, score in evaluations.items()]))
+                )
+                if len(self._pending_rows) >= self.commit_interval:
+                    self._flush()
+
+    def _flush(self):
+        # Rows are buffered and written in one short transaction, so the write
+        # lock is not held between puts while other processes use the file.
+        if self._pending_rows:
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?, ?)", self._pending_rows)
+            self._pending_rows = []
+
+    def _remember(self, key, evaluations):
+        previous = self.entries.get(key)
+        if previous is not None:
+            self.memory -= _entry_size(previous)
+        self.entries[key] = evaluations
+        self.entries.move_to_end(key)
+        self.memory += _entry_size(evaluations)
+        while self.memory > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.memory -= _entry_size(evicted)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        """Drop the entries kept in memory and reset the counters; the SQLite file is kept."""
+        with self._lock:
+            self.entries.clear()
+            self.memory = 0
+            self.hits = 0
+            self.misses = 0
+            self.disk_hits = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self.db is not None:
+                self._flush()
+                self.db.close()
+                self.db = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,10 +1,18 @@
 import chess
 import chess.engine
-from functools import lru_cache
+from lc0_cache import Lc0Cache
+from transposition import position_key
 
+default_cache = Lc0Cache()
 
-@lru_cache(maxsize=None)
-def get_lc0_evaluations_cached(engine, fen: str, is_black, lc0_depth = 2):
+
+def _score(info, is_black):
+    if is_black:
+        return info["score"].black().score(mate_score=100000)
+    return info["score"].white().score(mate_score=100000)
+
+
+def get_lc0_move_evaluations(engine, fen: str, is_black, lc0_depth = 2):
 
     board = chess.Board(fen)
     evaluations = {}
@@ -18,16 +26,60 @@ def get_lc0_evaluations_cached(engine, fen: str, is_black, lc0_depth = 2):
             continue
         info = engine.analyse(board, chess.engine.Limit(depth=lc0_depth))
         board.pop()
-        if is_black:
-            score = info["score"].black().score(mate_score=100000)
+        evaluations[move] = _score(info, is_black)
+
+    return evaluations
+
+
+def get_lc0_multipv_evaluations(engine, fen: str, is_black, lc0_depth = 2):
+    """
+    Score every legal move with a single MultiPV analyse call.
+
+    Moves that end the game keep the fixed score used by
+    get_lc0_move_evaluations, and any move the engine leaves out of its
+    MultiPV output is analysed on its own.
+    """
+    board = chess.Board(fen)
+    legal_moves = list(board.legal_moves)
+    if not legal_moves:
+        return {}
+
+    infos = engine.analyse(board, chess.engine.Limit(depth=lc0_depth), multipv=len(legal_moves))
+    scores = {}
+    for info in infos:
+        if info.get("pv") and "score" in info:
+            scores[info["pv"][0]] = _score(info, is_black)
+
+    evaluations = {}
+    for move in legal_moves:
+        board.push(move)
+        if board.is_game_over():
+            evaluations[move] = 100000
+        elif move in scores:
+            evaluations[move] = scores[move]
         else:
-            score = info["score"].white().score(mate_score=100000)
-        evaluations[move] = score
+            info = engine.analyse(board, chess.engine.Limit(depth=lc0_depth))
+            evaluations[move] = _score(info, is_black)
+        board.pop()
 
     return evaluations
 
 
-def get_lc0_evaluations(engine, board: chess.Board, is_black = True, lc0_depth = 2):
-    fen = board.fen()
-    return get_lc0_evaluations_cached(engine, fen, is_black, lc0_depth = lc0_depth)
+def get_lc0_evaluations(engine, board: chess.Board, is_black = True, lc0_depth = 2, multipv = False, cache = None):
+    """
+    Return {move: score} for every legal move, reusing cached results.
 
+    Results are cached by Zobrist hash, depth, side and backend in the given
+    Lc0Cache, or in the module-wide default_cache.
+    """
+    cache = default_cache if cache is None else cache
+    key = (position_key(board), lc0_depth, is_black, multipv)
+    evaluations = cache.get(key)
+    if evaluations is None:
+        fen = board.fen()
+        if multipv:
+            evaluations = get_lc0_multipv_evaluations(engine, fen, is_black, lc0_depth = lc0_depth)
+        else:
+            evaluations = get_lc0_move_evaluations(engine, fen, is_black, lc0_depth = lc0_depth)
+        cache.put(key, evaluations)
+    return evaluations
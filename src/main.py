@@ -1,85 +1,212 @@
 import chess
 import chess.pgn
 from algorithms import get_best_move_alpha_beta
+from clock import GameClock
 import os
 from datetime import datetime
 from dotenv import load_dotenv
+from engine_pool import EnginePool
+from game_store import EXTENSION, GameWriter
+from lc0_cache import Lc0Cache
 from monte_carlo import MCTS
+from opening_book import OpeningBook
+from parallel_search import ParallelSearcher
+from pondering import AlphaBetaPlayer
+from transposition import TranspositionTable
 
 load_dotenv()
 engine_path = os.getenv("ENGINE_PATH")
 weights_path = os.getenv("WEIGHTS_PATH")
 save_dir = os.getenv("SAVE_DIR")
-
-def main(game_index, save_directory):
+lc0_cache_path = os.getenv("LC0_CACHE_PATH") or None
+book_path = os.getenv("BOOK_PATH") or None
+# "pgn" writes game_{index}.pgn per game, "binary" appends to games.grec (see game_store.py).
+OUTPUT_FORMATS = ("pgn", "binary")
+output_format = "pgn"
+
+def open_engine(size=1, timeout=60.0):
+    return EnginePool([engine_path, f"--weights={os.path.expanduser(weights_path)}"], size=size, timeout=timeout)
+
+def open_lc0_cache(max_memory_mb=256):
+    return Lc0Cache(max_memory_mb=max_memory_mb, path=lc0_cache_path)
+
+def play_game(game_index, engine, lc0_cache, verbose=True) -> chess.pgn.Game:
+    """Play one Alpha-Beta (White) vs MCTS (Black) game with the given engine and cache and return it."""
+    # (base seconds, increment) per player; None searches a fixed depth and
+    # simulation count. With a clock, mcts_simulations is an upper bound.
+    time_control = (300, 2)
+    alpha_beta_depth = 4
     mcts_simulations = 1000
     mcts_max_depth = 35
+    mcts_processes = 1
+    mcts_parallel_mode = "root"
+    mcts_max_nodes = 100_000
+    tt_size_mb = 64
+    alpha_beta_processes = 1
+    # Selective search methods for White, see algorithms.PRUNING_METHODS.
+    alpha_beta_pruning = ()
+    # Each side keeps searching while the other one thinks.
+    ponder = False
+    # Write search statistics into the PGN move comments.
+    record_stats = False
+    # Both sides play from the BOOK_PATH opening book, if set, up to this ply,
+    # picking book moves at random by weight or always the heaviest one.
+    book_max_ply = 16
+    book_randomize = True
+
+    log = print if verbose else (lambda *args, **kwargs: None)
 
     board = chess.Board()
     move_limit = 22
     game_moves = []
-    with chess.engine.SimpleEngine.popen_uci([engine_path, f"--weights={os.path.expanduser(weights_path)}"]) as engine:
-        mcts = MCTS(board.copy(), simulations=mcts_simulations, lc0_engine=engine, max_depth=mcts_max_depth)
-
-        start_time = datetime.now()
-
-        for move_number in range(1, move_limit + 1):
-            print(f"Move {move_number}:")
-            print(board)
-            if board.is_game_over():
-                print("Game over!")
-                break
-            if board.turn == chess.WHITE:
-                print(f"Alpha-Beta pruning (White) is thinking with depth {4}...")
-                move = get_best_move_alpha_beta(board.copy(), depth=4)
+    book = OpeningBook(book_path, book_max_ply, book_randomize) if book_path is not None else None
+    mcts = MCTS(board.copy(), simulations=mcts_simulations, lc0_engine=engine, max_depth=mcts_max_depth, lc0_cache=lc0_cache,
+                processes=mcts_processes, parallel_mode=mcts_parallel_mode, max_nodes=mcts_max_nodes, book=book)
+    transposition_table = TranspositionTable(max_memory_mb=tt_size_mb)
+    parallel_searcher = ParallelSearcher(alpha_beta_processes, tt_size_mb, alpha_beta_pruning, book) if alpha_beta_processes > 1 and not ponder else None
+    white_player = AlphaBetaPlayer(tt_size_mb, alpha_beta_pruning, book) if ponder else None
+    clock = GameClock(*time_control) if time_control is not None else None
+    move_times = []
+    clock_times = []
+    move_stats = []
+    searched_depths = []
+    simulation_counts = []
+    time_forfeit = None
+
+    start_time = datetime.now()
+
+    for move_number in range(1, move_limit + 1):
+        log(f"Move {move_number}:")
+        log(board)
+        if board.is_game_over():
+            log("Game over!")
+            break
+        color = board.turn
+        think_time = clock.budget(color) if clock is not None else None
+        if clock is not None:
+            clock.start(color)
+        if color == chess.WHITE:
+            if think_time is not None:
+                log(f"Alpha-Beta pruning (White) is thinking for {think_time:.1f}s...")
             else:
-                print(f"Running MCTS for Black with {mcts_simulations} simulations and max depth {mcts_max_depth}...")
-                mcts.update_current_node(board.copy(), board.peek())
-
-                best_move = mcts.run()
-                if best_move is None:
-                    break
-                print(f"Black plays: {best_move}")
-
-                move = best_move
-            board.push(move)
-            game_moves.append(move)
-
-        print("Final Board:")
-        print(board)
-        print("Game Result:", board.result())
-
-        end_time = datetime.now()
-
-        game = chess.pgn.Game()
-
-        game.headers["Event"] = "AI vs AI Match"
-        game.headers["Site"] = "Terminal Simulation"
-        game.headers["Date"] = start_time.strftime("%Y.%m.%d")
-        game.headers["Round"] = str(game_index)
-        game.headers["White"] = "AlphaBetaPruningAI"
-        game.headers["Black"] = "MonteCarloAI"
-        game.headers["Result"] = board.result()
-        game.headers["WhiteElo"] = "?"
-        game.headers["BlackElo"] = "?"
-        game.headers["TimeControl"] = "?"
-        game.headers["EndTime"] = end_time.strftime("%H:%M:%S %Z")
-        game.headers["Termination"] = board.outcome().termination.name if board.outcome() else "Unterminated"
-        game.headers["AlphaBetaDepth"] = str(5)
-        game.headers["MCTSSimulations"] = str(mcts_simulations)
-        game.headers["MCTSMaxDepth"] = str(mcts_max_depth)
-
-        node = game
-        for move in board.move_stack:
-            node = node.add_main_variation(move)
-
-        os.makedirs(save_directory, exist_ok=True)
-        pgn_path = os.path.join(save_directory, f'game_{game_index}.pgn')
-
-        with open(pgn_path, 'w') as pgn_file:
-            print(game, file=pgn_file)
-
-        print(f"Game {game_index} has been saved to {pgn_path}")
+                log(f"Alpha-Beta pruning (White) is thinking with depth {alpha_beta_depth}...")
+            if white_player is not None:
+                white_player.start_search(board, depth=None if think_time is not None else alpha_beta_depth, time_limit=think_time,
+                                          collect_stats=True)
+                pondered = mcts.ponder(white_player.search_done)
+                result = white_player.result()
+                log(f"MCTS (Black) pondered {pondered} simulations")
+            elif parallel_searcher is not None:
+                result = parallel_searcher.get_best_move(board, depth=None if think_time is not None else alpha_beta_depth,
+                                                         time_limit=think_time, collect_stats=True)
+            elif think_time is not None:
+                result = get_best_move_alpha_beta(board.copy(), tt=transposition_table, time_limit=think_time, collect_stats=True,
+                                                  pruning=alpha_beta_pruning, book=book)
+            else:
+                result = get_best_move_alpha_beta(board.copy(), depth=alpha_beta_depth, tt=transposition_table, collect_stats=True,
+                                                  pruning=alpha_beta_pruning, book=book)
+            move, stats = result
+            if not stats.book and stats.depth:
+                searched_depths.append(stats.depth)
+        else:
+            log(f"Running MCTS for Black with {mcts_simulations} simulations and max depth {mcts_max_depth}...")
+            mcts.update_current_node(board.copy(), board.peek())
+            if white_player is not None:
+                white_player.ponder(board)
+
+            best_move, stats = mcts.run(time_limit=think_time, collect_stats=True)
+            if best_move is None:
+                break
+            if not stats.book:
+                simulation_counts.append(stats.simulations)
+            log(f"Black plays: {best_move}")
+            if white_player is not None:
+                log("White ponder hit" if white_player.stop_pondering(best_move) else "White ponder miss")
+
+            move = best_move
+        if clock is not None:
+            move_times.append(clock.stop())
+            clock_times.append(clock.remaining[color])
+            if clock.flagged(color):
+                log(f"{'White' if color == chess.WHITE else 'Black'} lost on time!")
+                time_forfeit = color
+                break
+        board.push(move)
+        game_moves.append(move)
+        move_stats.append(stats if record_stats else None)
+
+    if parallel_searcher is not None:
+        parallel_searcher.close()
+    if white_player is not None:
+        white_player.close()
+    mcts.close()
+    if book is not None:
+        book.close()
+
+    log("Final Board:")
+    log(board)
+    if time_forfeit is not None:
+        result = "0-1" if time_forfeit == chess.WHITE else "1-0"
+        termination = "TIME_FORFEIT"
+    else:
+        result = board.result()
+        termination = board.outcome().termination.name if board.outcome() else "Unterminated"
+    log("Game Result:", result)
+    log(f"Lc0 cache: {lc0_cache.hits} hits, {lc0_cache.misses} misses ({lc0_cache.hit_rate:.1%} hit rate)")
+
+    end_time = datetime.now()
+
+    game = chess.pgn.Game()
+
+    game.headers["Event"] = "AI vs AI Match"
+    game.headers["Site"] = "Terminal Simulation"
+    game.headers["Date"] = start_time.strftime("%Y.%m.%d")
+    game.headers["Round"] = str(game_index)
+    game.headers["White"] = "AlphaBetaPruningAI"
+    game.headers["Black"] = "MonteCarloAI"
+    game.headers["Result"] = result
+    game.headers["WhiteElo"] = "?"
+    game.headers["BlackElo"] = "?"
+    game.headers["TimeControl"] = clock.time_control if clock is not None else "?"
+    game.headers["EndTime"] = end_time.strftime("%H:%M:%S %Z")
+    game.headers["Termination"] = termination
+    # The deepest search White completed and the mean number of simulations
+    # per Black move, which under a clock differ from the configured limits.
+    game.headers["AlphaBetaDepth"] = str(max(searched_depths)) if searched_depths else "?"
+    game.headers["MCTSSimulations"] = str(round(sum(simulation_counts) / len(simulation_counts))) if simulation_counts else "?"
+    game.headers["MCTSMaxDepth"] = str(mcts_max_depth)
+
+    node = game
+    for ply, move in enumerate(board.move_stack):
+        node = node.add_main_variation(move)
+        if move_stats[ply] is not None:
+            node.comment = move_stats[ply].pgn_comment()
+        if clock is not None:
+            node.set_clock(clock_times[ply])
+            node.set_emt(move_times[ply])
+
+    return game
+
+def save_game(game, game_index, save_directory, output_format="pgn"):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+    os.makedirs(save_directory, exist_ok=True)
+    if output_format == "binary":
+        store_path = os.path.join(save_directory, f'games{EXTENSION}')
+        with GameWriter(store_path) as writer:
+            writer.append(game)
+        return store_path
+    pgn_path = os.path.join(save_directory, f'game_{game_index}.pgn')
+
+    with open(pgn_path, 'w') as pgn_file:
+        print(game, file=pgn_file)
+    return pgn_path
+
+def main(game_index, save_directory):
+    with open_engine() as engine, open_lc0_cache() as lc0_cache:
+        game = play_game(game_index, engine, lc0_cache)
+    path = save_game(game, game_index, save_directory, output_format)
+    print(f"Game {game_index} has been saved to {path}")
 
 if __name__ == "__main__":
     main(game_index=1, save_directory=save_dir)
\ No newline at end of file
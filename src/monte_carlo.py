@@ -1,88 +1,512 @@
+import heapq
 import math
+import multiprocessing
+import queue
 import random
+import time
+from array import array
 import chess
-from lc0_eval import get_lc0_evaluations
+from bitbase import DRAW, WIN
+from bitbase import probe as probe_bitbase
+from lc0_eval import default_cache, get_lc0_evaluations
+from move_encoding import decode_move, encode_move
+from position_cache import default_position_cache, replay
+from search_stats import SearchStats
 
+PARALLEL_MODES = ("root", "tree")
+VIRTUAL_LOSS = 1
+# Seconds between checks of the stop signal while waiting for root workers.
+POLL_INTERVAL = 0.01
+# Initial number of slots of a NodeStore's child index.
+MIN_INDEX_SIZE = 64
 
-class MCTSNode:
-    def __init__(self, board, depth, is_black = False, move = None, parent = None):
-        self.board = board
+_worker_stop = None
+
+
+class NodeStore:
+    """
+    Struct-of-arrays storage for the MCTS tree.
+
+    Every node is an index into flat typed arrays (parent, 16-bit move, visits,
+    wins, depth, first child, next sibling and expansion flag), 25 bytes per
+    node with no per-node Python objects. Only the root board is kept; the
+    board of any other node is rebuilt by replaying the moves on the path from
+    the root.
+
+    Children are indexed by (parent, move) in an open-addressed hash table of
+    node indices, itself a typed array kept at most half full (8 to 16 bytes
+    per node), so finding a child takes constant time. A node is flagged once
+    all its legal moves have been added.
+
+    reroot() and prune() compact the arrays to the nodes that are kept, so
+    memory is released as the game moves on.
+    """
+
+    def __init__(self, root_board: chess.Board):
+        self.root_board = root_board.copy()
+        self.parent = array('i')
+        self.move = array('H')
+        self.visits = array('I')
+        self.wins = array('i')
+        self.depth = array('H')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.expanded = array('B')
+        self._board_cache = None
+        self._reindex(MIN_INDEX_SIZE)
+        self.add(-1, None, 0)
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self, parent: int, move: chess.Move | None, depth: int) -> int:
+        index = len(self.parent)
+        self.parent.append(parent)
+        self.move.append(encode_move(move))
+        self.visits.append(0)
+        self.wins.append(0)
+        self.depth.append(depth)
+        self.first_child.append(-1)
+        self.expanded.append(0)
+        if parent >= 0:
+            self.next_sibling.append(self.first_child[parent])
+            self.first_child[parent] = index
+            if 2 * len(self.parent) > len(self._slots):
+                self._reindex(2 * len(self._slots))
+            else:
+                self._index_node(index)
+        else:
+            self.next_sibling.append(-1)
+        return index
+
+    def _slot(self, parent: int, code: int) -> int:
+        return (parent * 0x9E3779B1 ^ code * 0x85EBCA6B) & self._mask
+
+    def _index_node(self, index: int) -> None:
+        slots = self._slots
+        slot = self._slot(self.parent[index], self.move[index])
+        while slots[slot] >= 0:
+            slot = (slot + 1) & self._mask
+        slots[slot] = index
+
+    def _reindex(self, size: int) -> None:
+        """Rebuild the child index with size slots, a power of two."""
+        self._slots = array('i', [-1]) * size
+        self._mask = size - 1
+        for index in range(len(self.parent)):
+            if self.parent[index] >= 0:
+                self._index_node(index)
+
+    def find(self, parent: int, move: chess.Move) -> int:
+        """Index of the parent's child for this move, or -1."""
+        return self.find_code(parent, encode_move(move))
+
+    def find_code(self, parent: int, code: int) -> int:
+        """Index of the parent's child for this encoded move, or -1."""
+        slots = self._slots
+        slot = self._slot(parent, code)
+        while True:
+            child = slots[slot]
+            if child < 0 or (self.parent[child] == parent and self.move[child] == code):
+                return child
+            slot = (slot + 1) & self._mask
+
+    def child_moves(self, index: int) -> set:
+        """Encoded moves of the node's children."""
+        return {self.move[child] for child in self.children(index)}
+
+    def children(self, index: int):
+        child = self.first_child[index]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def path(self, index: int) -> list:
+        """Moves from the root to the node."""
+        moves = []
+        while self.parent[index] >= 0:
+            moves.append(decode_move(self.move[index]))
+            index = self.parent[index]
+        moves.reverse()
+        return moves
+
+    def board(self, index: int) -> chess.Board:
+        """Rebuild the node's board from the root; the result may be modified."""
+        cached = self._board_cache
+        if cached is not None and cached[0] == index:
+            return cached[1].copy()
+        if cached is not None and cached[0] == self.parent[index]:
+            board = cached[1].copy()
+            board.push(decode_move(self.move[index]))
+        else:
+            board = self.root_board.copy()
+            for move in self.path(index):
+                board.push(move)
+        self._board_cache = (index, board.copy())
+        return board
+
+    def remember_board(self, index: int, board: chess.Board) -> None:
+        """Cache a board the caller already built for this node."""
+        self._board_cache = (index, board.copy())
+
+    def reroot(self, index: int, board: chess.Board) -> None:
+        """Make the node, whose position is board, the new root and drop every node outside its subtree."""
+        kept = []
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            kept.append(node)
+            stack.extend(self.children(node))
+        self.root_board = board.copy()
+        self._rebuild(kept)
+
+    def prune(self, max_nodes: int) -> int:
+        """
+        Shrink the tree to at most max_nodes nodes and return how many were
+        removed. Nodes are kept best-first by visit count starting from the
+        root, so the least visited subtrees are dropped.
+        """
+        if len(self) <= max_nodes:
+            return 0
+        kept = []
+        frontier = [(-self.visits[0], 0)]
+        while frontier and len(kept) < max_nodes:
+            _, node = heapq.heappop(frontier)
+            kept.append(node)
+            for child in self.children(node):
+                heapq.heappush(frontier, (-self.visits[child], child))
+        removed = len(self) - len(kept)
+        self._rebuild(kept)
+        return removed
+
+    def _rebuild(self, kept: list) -> None:
+        """
+        Compact the arrays to the kept nodes, which must contain the parent of
+        every kept node except the smallest index, the new root. Sibling order
+        is preserved, and nodes that lost children are no longer flagged as
+        expanded.
+        """
+        kept = sorted(kept)
+        remap = {old: new for new, old in enumerate(kept)}
+        parent = array('i')
+        move = array('H')
+        visits = array('I')
+        wins = array('i')
+        depth = array('H')
+        expanded = array('B')
+        first_child = array('i', [-1]) * len(kept)
+        next_sibling = array('i', [-1]) * len(kept)
+
+        for new, old in enumerate(kept):
+            new_parent = remap[self.parent[old]] if new else -1
+            parent.append(new_parent)
+            move.append(self.move[old])
+            visits.append(self.visits[old])
+            wins.append(self.wins[old])
+            depth.append(self.depth[old])
+            complete = self.expanded[old] and all(child in remap for child in self.children(old))
+            expanded.append(1 if complete else 0)
+            if new_parent >= 0:
+                next_sibling[new] = first_child[new_parent]
+                first_child[new_parent] = new
+
+        self.parent = parent
         self.move = move
+        self.visits = visits
+        self.wins = wins
         self.depth = depth
-        self.parent = parent
-        self.children = []
-        self.visits = 0
-        self.win = 0
-        self.is_black = is_black
+        self.expanded = expanded
+        self.first_child = first_child
+        self.next_sibling = next_sibling
+        self._board_cache = None
+        size = MIN_INDEX_SIZE
+        while size < 2 * len(kept):
+            size *= 2
+        self._reindex(size)
+
+
+class MCTSNode:
+    """Lightweight view of one node in a NodeStore."""
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: NodeStore, index: int):
+        self.store = store
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, MCTSNode) and other.store is self.store and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.store), self.index))
+
+    @property
+    def board(self) -> chess.Board:
+        return self.store.board(self.index)
+
+    @property
+    def move(self) -> chess.Move | None:
+        return decode_move(self.store.move[self.index])
+
+    @property
+    def depth(self) -> int:
+        return self.store.depth[self.index]
+
+    @property
+    def is_black(self) -> bool:
+        return self.store.depth[self.index] % 2 == 1
+
+    @property
+    def parent(self):
+        parent = self.store.parent[self.index]
+        return MCTSNode(self.store, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> list:
+        return [MCTSNode(self.store, child) for child in self.store.children(self.index)]
+
+    @property
+    def visits(self) -> int:
+        return self.store.visits[self.index]
+
+    @visits.setter
+    def visits(self, value):
+        self.store.visits[self.index] = value
+
+    @property
+    def win(self) -> int:
+        return self.store.wins[self.index]
+
+    @win.setter
+    def win(self, value):
+        self.store.wins[self.index] = value
 
     def ucb1(self):
+        store = self.store
+        visits = store.visits[self.index]
         dd = dict()
-        for child in self.children:
-            if child.visits <= 0:
-                dd[child.move] = 100
-            elif self.visits <= 0:
-                dd[child.move] = 100
+        for child in store.children(self.index):
+            child_visits = store.visits[child]
+            move = decode_move(store.move[child])
+            if child_visits <= 0:
+                dd[move] = 100
+            elif visits <= 0:
+                dd[move] = 100
             else:
-                dd[child.move] = (child.win/child.visits) / math.sqrt(2) * math.sqrt(math.log(self.visits) / child.visits)
+                dd[move] = (store.wins[child]/child_visits) / math.sqrt(2) * math.sqrt(math.log(visits) / child_visits)
 
-        return dd 
+        return dd
 
     def add_child(self, move):
-        temp_board = self.board.copy()
-        temp_board.push(move)
-        new_child = MCTSNode(temp_board,  self.depth + 1, not self.is_black, move, self)
-        self.children.append(new_child)
-        return new_child    
-    
-    def find_child(self, board, move =None):
-        for child in self.children:
-            if child.board == board:
-                return child
+        child = self.store.add(self.index, move, self.depth + 1)
+        return MCTSNode(self.store, child)
+
+    def find_child(self, board, move = None):
+        move = board.peek() if move is None else move
+        child = self.store.find(self.index, move)
+        if child >= 0:
+            return MCTSNode(self.store, child)
         return self.add_child(move)
 
     def has_child(self, board):
-        for child in self.children:
-            if child.board == board:
-                return True
-        return False
-    
+        return self.store.find(self.index, board.peek()) >= 0
+
     def is_fully_expanded(self):
-        legal_moves = list(self.board.legal_moves)
-        for i in self.children:
-            if i.move not in legal_moves:
-                return False
+        store = self.store
+        if not store.expanded[self.index]:
+            tried = store.child_moves(self.index)
+            for move in default_position_cache.legal_moves(self.board):
+                if encode_move(move) not in tried:
+                    return False
+            store.expanded[self.index] = 1
         return True
 
+def random_legal_move(board: chess.Board):
+    """
+    Pick a uniformly random legal move, or None if there is none.
+
+    Pseudo-legal moves are drawn at random and only the drawn ones are checked
+    for leaving the king in check, which is cheaper than generating the full
+    legal move list.
+    """
+    moves = list(board.generate_pseudo_legal_moves())
+    while moves:
+        index = random.randrange(len(moves))
+        move = moves[index]
+        if not board.is_into_check(move):
+            return move
+        moves[index] = moves[-1]
+        moves.pop()
+    return None
+
+def random_playout(board: chess.Board, max_plies: int, on_move=None) -> int:
+    """
+    Play random moves on the board and return the reward (1 if black wins,
+    -1 if white wins, 0 otherwise).
+
+    Instead of calling is_game_over() every ply, the game-ending conditions
+    are tested only when they can have changed: no legal move left, a capture
+    for insufficient material, and the halfmove clock for the 75-move rule and
+    repetitions. on_move, if given, is called with each move played and
+    returns the callback to use for the next move, or None to stop.
+
+    Once only three pieces are left, the playout ends with the result from
+    the endgame bitbases if they cover the position.
+    """
+    reward = _bitbase_reward(board)
+    if reward is not None:
+        return reward
+    for _ in range(max_plies):
+        move = random_legal_move(board)
+        if move is None:
+            if board.is_check():
+                return 1 if board.turn == chess.WHITE else -1
+            return 0
+        is_capture = board.is_capture(move)
+        board.push(move)
+
+        if on_move is not None:
+            on_move = on_move(move)
+
+        if is_capture:
+            if board.is_insufficient_material():
+                break
+            reward = _bitbase_reward(board)
+            if reward is not None:
+                return reward
+        # Fifty reversible plies are needed for the 75-move rule and at
+        # least sixteen for a fivefold repetition.
+        if board.halfmove_clock >= 150:
+            break
+        if board.halfmove_clock >= 16 and board.is_fivefold_repetition():
+            break
+    return 0
+
+def _bitbase_reward(board: chess.Board) -> int | None:
+    """Playout reward of a position covered by the bitbases, or None."""
+    if chess.popcount(board.occupied) > 3:
+        return None
+    result = probe_bitbase(board)
+    if result is None or result == DRAW:
+        return result
+    black_wins = (result == WIN) == (board.turn == chess.BLACK)
+    return 1 if black_wins else -1
+
 def softmax_dict(input_dict):
     values = list(input_dict.values())
     max_value = max(values)
     exp_values = [math.exp(v - max_value) for v in values]
     sum_exp_values = sum(exp_values)
     softmax_values = [v / sum_exp_values for v in exp_values]
-    
+
     return {key: softmax_values[i] for i, key in enumerate(input_dict.keys())}
 
 
+def _out_of_time(deadline, stop_event, clock=time.monotonic):
+    if deadline is not None and clock() >= deadline:
+        return True
+    return stop_event is not None and stop_event.is_set()
+
+def _init_worker(stop):
+    global _worker_stop
+    _worker_stop = stop
+
+def _grow_tree(root_fen, move_stack, depth, simulations, max_depth, seed, deadline):
+    """
+    Root parallelism worker: build an independent tree below the position and
+    return the statistics of its nodes as (move code path, visits, wins).
+    The deadline is wall-clock time, since it is set in another process.
+    """
+    random.seed(seed)
+    tree = MCTS(replay(root_fen, move_stack), simulations, None, max_depth=max_depth)
+    store = tree.store
+    store.depth[0] = depth
+    for _ in range(simulations):
+        if _out_of_time(deadline, _worker_stop, time.time):
+            break
+        leaf, reward = tree.simulate(tree.root)
+        tree.backpropagation(leaf, reward, stop=-1)
+
+    paths = [()]
+    for index in range(1, len(store)):
+        paths.append(paths[store.parent[index]] + (store.move[index],))
+    return [(paths[index], store.visits[index], store.wins[index]) for index in range(len(store)) if store.visits[index]]
+
+def _playout(root_fen, move_stack, max_plies, seed):
+    """Tree parallelism worker: one random playout from the position."""
+    random.seed(seed)
+    return random_playout(replay(root_fen, move_stack), max_plies)
+
+
 class MCTS:
-    def __init__(self, board: chess.Board, simulations, lc0_engine, max_depth = 50, ) -> None:
-        self.root = MCTSNode(board, 0)
+    """
+    Monte Carlo tree search player.
+
+    With processes > 1 the simulations of run() are spread over a process
+    pool. In "root" mode every worker grows an independent tree below the
+    selected move and the trees are merged into this one by adding up visits
+    and wins. In "tree" mode this process keeps the only tree, walks it to a
+    new leaf per simulation and hands the rollout to a worker; nodes on the
+    path of a pending rollout carry a virtual loss so that concurrent
+    simulations spread over different branches.
+
+    run() stops early, keeping the move it selected and the simulations done
+    so far, once its time_limit (seconds) runs out or its stop_event is set.
+    With collect_stats it returns (move, SearchStats).
+
+    Every update_current_node() re-roots the tree at the new position, keeping
+    the statistics of its subtree and freeing the rest. With max_nodes set,
+    the least visited subtrees are pruned whenever the tree grows beyond it.
+
+    Legal moves and game-over checks of tree nodes come from position_cache,
+    by default the process-wide cache that alpha-beta also uses. Rollouts
+    sample moves directly, since their random positions rarely repeat.
+
+    With an OpeningBook, run() plays the book move without simulating while
+    the position is in the book.
+    """
+
+    def __init__(self, board: chess.Board, simulations, lc0_engine, max_depth = 50, lc0_multipv = True, lc0_cache = None,
+                 processes = 1, parallel_mode = "root", max_nodes = None, position_cache = None, book = None) -> None:
+        if parallel_mode not in PARALLEL_MODES:
+            raise ValueError(f"parallel_mode must be one of {PARALLEL_MODES}, got {parallel_mode!r}")
+        self.store = NodeStore(board)
+        self.root = MCTSNode(self.store, 0)
         self.current_node = self.root
+        self.current_board = board.copy()
         self.max_depth = max_depth
         self.simulations = simulations
         self.engine = lc0_engine
+        self.lc0_multipv = lc0_multipv
+        self.lc0_cache = lc0_cache
+        self.processes = processes
+        self.parallel_mode = parallel_mode
+        self.max_nodes = max_nodes
+        self.positions = default_position_cache if position_cache is None else position_cache
+        self.book = book
+        self.pool = None
+        if processes > 1:
+            self._worker_stop = multiprocessing.Event()
+            self.pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(self._worker_stop,))
 
     def update_current_node(self, board: chess.Board, move = None):
-        for child in self.current_node.children:
-            if child.board == board:
-                self.current_node = child
-                return child
-        self.current_node  = self.current_node.add_child(move)
+        move = board.peek() if move is None else move
+        store = self.store
+        child = store.find(self.current_node.index, move)
+        if child < 0:
+            child = store.add(self.current_node.index, move, self.current_node.depth + 1)
+        store.reroot(child, board)
+        if self.max_nodes is not None:
+            store.prune(self.max_nodes)
+        self.root = self.current_node = MCTSNode(store, 0)
+        self.current_board = board.copy()
+        store.remember_board(0, board)
         self.expand(self.current_node)
         return self.current_node
 
     def select(self):
         self.expand(self.current_node)
-        lco_evaluations = softmax_dict(get_lc0_evaluations(self.engine, self.current_node.board))
+        lco_evaluations = softmax_dict(get_lc0_evaluations(self.engine, self.current_board, multipv=self.lc0_multipv, cache=self.lc0_cache))
         ucb1_evaluations = softmax_dict(self.current_node.ucb1())
         total_evaluations = dict()
 
@@ -97,58 +521,269 @@ class MCTS:
         moves = [move for move, score in top_moves]
         selected_move = random.choice(moves)
         return selected_move
-    
+
     def simulate(self, node: MCTSNode):
-        depth = 0
-        temporary_board = node.board.copy()
-        current_node = node
-        while not temporary_board.is_game_over() and depth < self.max_depth: 
-            depth += 1
-            legal_moves = list(temporary_board.legal_moves)
-            move = random.choice(legal_moves)
-            temporary_board.push(move)
-            current_node = current_node.find_child(temporary_board, move)
-        result = temporary_board.result()
-        
-        if result == '1-0':
-            return current_node, -1
-        elif result == '0-1':
-            return current_node, 1
-        else:
-            return current_node, 0 
-        
-    def backpropagation(self, node: MCTSNode, reward: int) -> None:
-        while node != self.current_node:
-            if node.is_black:
-                node.win += reward
+        """
+        Play one random rollout from the node and return (leaf, reward).
+
+        The rollout follows existing tree nodes, adds the first position that
+        is not in the tree yet as the new leaf, and plays the remaining moves
+        on a scratch board without creating nodes.
+        """
+        store = self.store
+        leaf = node.index
+
+        def follow(move):
+            nonlocal leaf
+            child = store.find(leaf, move)
+            if child >= 0:
+                leaf = child
+                return follow
+            leaf = store.add(leaf, move, store.depth[leaf] + 1)
+            return None
+
+        reward = random_playout(node.board, self.max_depth, follow)
+        return MCTSNode(store, leaf), reward
+
+    def backpropagation(self, node: MCTSNode, reward: int, stop = None) -> None:
+        """Update the nodes from the leaf up to, but not including, stop (the current node by default)."""
+        store = self.store
+        index = node.index
+        stop = self.current_node.index if stop is None else stop
+        while index != stop:
+            if store.depth[index] % 2 == 1:
+                store.wins[index] += reward
             else:
-                node.win -= reward
-            node.visits += 1
-            node = node.parent
+                store.wins[index] -= reward
+            store.visits[index] += 1
+            index = store.parent[index]
 
     def expand(self, node):
-        for move in list(node.board.legal_moves):
-            child_board = node.board.copy()
-            child_board.push(move)
-            if not node.has_child(child_board):
+        store = self.store
+        if store.expanded[node.index]:
+            return
+        board = self.current_board if node == self.current_node else node.board
+        tried = store.child_moves(node.index)
+        for move in self.positions.legal_moves(board):
+            if encode_move(move) not in tried:
                 node.add_child(move)
+        store.expanded[node.index] = 1
+
+    def ponder(self, stop_event, max_simulations = None) -> int:
+        """
+        Run simulations from the current node, over all the opponent's replies,
+        until stop_event is set, and return how many were run. The subtree of
+        the reply actually played keeps these statistics when
+        update_current_node() re-roots the tree.
+        """
+        count = 0
+        while not stop_event.is_set() and (max_simulations is None or count < max_simulations):
+            leaf, reward = self.simulate(self.current_node)
+            self.backpropagation(leaf, reward)
+            count += 1
+        return count
+
+    def run(self, time_limit = None, stop_event = None, collect_stats = False):
+        start = time.monotonic()
+        book_move = self.book.move(self.current_board) if self.book is not None else None
+        if book_move is not None:
+            return self._play_book_move(book_move, start, collect_stats)
+        deadline = start + time_limit if time_limit is not None else None
+        stats = SearchStats() if collect_stats else None
+        if stats is not None:
+            cache = default_cache if self.lc0_cache is None else self.lc0_cache
+            lookups, hits = cache.hits + cache.misses, cache.hits
+            phase_start = time.perf_counter()
+            self.expand(self.current_node)
+            stats.phase_times["expand"] += time.perf_counter() - phase_start
+            phase_start = time.perf_counter()
 
-    def run(self):
-        temporary_board = self.current_node.board.copy()
+        temporary_board = self.current_board.copy()
         move = self.select()
+        if stats is not None:
+            stats.phase_times["select"] += time.perf_counter() - phase_start
         temporary_board.push(move)
         node = self.current_node.find_child(temporary_board, move)
-        for _ in range(self.simulations):
-            if not temporary_board.is_game_over():
-                node, reward = self.simulate(node)
+        self.store.remember_board(node.index, temporary_board)
+        if not self.positions.is_game_over(temporary_board):
+            visits = self.store.visits[node.index]
+            phase_start = time.perf_counter()
+            if self.pool is None:
+                for _ in range(self.simulations):
+                    if _out_of_time(deadline, stop_event):
+                        break
+                    if stats is None:
+                        leaf, reward = self.simulate(node)
+                        self.backpropagation(leaf, reward)
+                    else:
+                        self._timed_simulation(node, stats)
+            elif self.parallel_mode == "tree":
+                self._run_tree_parallel(node, temporary_board, deadline, stop_event)
             else:
-                tem_board = self.current_node.board.copy()
-                tem_board.push(move)
-                self.update_current_node(tem_board, move)
-                return move
-            self.backpropagation(node, reward)
+                self._run_root_parallel(node, temporary_board, deadline, stop_event)
+            if stats is not None:
+                stats.simulations = self.store.visits[node.index] - visits
+                if self.pool is not None:
+                    # Workers are not timed phase by phase.
+                    stats.phase_times["simulate"] += time.perf_counter() - phase_start
 
-        tem_board = self.current_node.board.copy()
+        if stats is not None:
+            stats.tree_size = len(self.store)
+            stats.lc0_requests = cache.hits + cache.misses - lookups
+            stats.lc0_cache_hits = cache.hits - hits
+        tem_board = self.current_board.copy()
         tem_board.push(move)
         self.update_current_node(tem_board, move)
-        return move
\ No newline at end of file
+        if stats is not None:
+            stats.elapsed = time.monotonic() - start
+            return move, stats
+        return move
+
+    def _play_book_move(self, move: chess.Move, start: float, collect_stats: bool):
+        board = self.current_board.copy()
+        board.push(move)
+        self.update_current_node(board, move)
+        if not collect_stats:
+            return move
+        stats = SearchStats()
+        stats.book = True
+        stats.tree_size = len(self.store)
+        stats.elapsed = time.monotonic() - start
+        return move, stats
+
+    def _timed_simulation(self, node: MCTSNode, stats: SearchStats):
+        start = time.perf_counter()
+        leaf, reward = self.simulate(node)
+        middle = time.perf_counter()
+        self.backpropagation(leaf, reward)
+        stats.phase_times["simulate"] += middle - start
+        stats.phase_times["backpropagate"] += time.perf_counter() - middle
+
+    def _run_root_parallel(self, node: MCTSNode, board: chess.Board, deadline = None, stop_event = None):
+        self._worker_stop.clear()
+        wall_deadline = time.time() + deadline - time.monotonic() if deadline is not None else None
+        root_fen = board.root().fen()
+        move_stack = [move.uci() for move in board.move_stack]
+        depth = self.store.depth[node.index]
+        shares = [self.simulations // self.processes + (i < self.simulations % self.processes) for i in range(self.processes)]
+        pending = [
+            self.pool.apply_async(_grow_tree, (root_fen, move_stack, depth, share, self.max_depth, random.getrandbits(32), wall_deadline))
+            for share in shares if share
+        ]
+        for result in pending:
+            while not result.ready():
+                if stop_event is not None and stop_event.is_set():
+                    self._worker_stop.set()
+                result.wait(POLL_INTERVAL)
+            self._merge(node.index, result.get())
+
+    def _merge(self, index: int, statistics: list):
+        """Add the statistics of a worker tree rooted at the given node."""
+        store = self.store
+        for path, visits, wins in statistics:
+            node = index
+            for code in path:
+                child = store.find_code(node, code)
+                if child < 0:
+                    child = store.add(node, decode_move(code), store.depth[node] + 1)
+                node = child
+            store.visits[node] += visits
+            store.wins[node] += wins
+
+    def _run_tree_parallel(self, node: MCTSNode, board: chess.Board, deadline = None, stop_event = None):
+        root_fen = board.root().fen()
+        move_stack = [move.uci() for move in board.move_stack]
+        stop = self.current_node.index
+        finished = queue.Queue()
+        launched = in_flight = 0
+        stopped = False
+        error = None
+
+        while True:
+            stopped = stopped or error is not None or _out_of_time(deadline, stop_event)
+            while not stopped and launched < self.simulations and in_flight < 2 * self.processes:
+                leaf, path = self._descend(node.index, board)
+                self._add_virtual_loss(leaf, stop, VIRTUAL_LOSS)
+                self.pool.apply_async(
+                    _playout,
+                    (root_fen, move_stack + [move.uci() for move in path], self.max_depth - len(path), random.getrandbits(32)),
+                    callback=lambda reward, leaf=leaf: finished.put((leaf, reward, None)),
+                    error_callback=lambda exc, leaf=leaf: finished.put((leaf, 0, exc)),
+                )
+                launched += 1
+                in_flight += 1
+            if not in_flight:
+                break
+
+            leaf, reward, exc = finished.get()
+            in_flight -= 1
+            self._add_virtual_loss(leaf, stop, -VIRTUAL_LOSS)
+            if exc is not None:
+                error = error or exc
+                continue
+            self.backpropagation(MCTSNode(self.store, leaf), reward, stop)
+
+        if error is not None:
+            raise error
+
+    def _descend(self, index: int, board: chess.Board):
+        """
+        Walk from the node by UCB1 to a position with an untried move, add that
+        move as the new leaf and return (leaf, moves from the node).
+        """
+        store = self.store
+        board = board.copy()
+        path = []
+        while len(path) < self.max_depth:
+            if not store.expanded[index]:
+                tried = store.child_moves(index)
+                untried = [move for move in self.positions.legal_moves(board) if encode_move(move) not in tried]
+                if untried:
+                    move = random.choice(untried)
+                    path.append(move)
+                    return store.add(index, move, store.depth[index] + 1), path
+                store.expanded[index] = 1
+            child = self._best_child(index)
+            if child < 0:
+                break
+            move = decode_move(store.move[child])
+            board.push(move)
+            path.append(move)
+            index = child
+        return index, path
+
+    def _best_child(self, index: int) -> int:
+        """Child with the highest MCTSNode.ucb1 value, or -1 if there is none."""
+        store = self.store
+        visits = store.visits[index]
+        best, best_value = -1, -math.inf
+        for child in store.children(index):
+            child_visits = store.visits[child]
+            if child_visits <= 0 or visits <= 0:
+                value = 100
+            else:
+                value = (store.wins[child]/child_visits) / math.sqrt(2) * math.sqrt(math.log(visits) / child_visits)
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+    def _add_virtual_loss(self, index: int, stop: int, loss: int):
+        """Count a pending simulation as a lost visit on the path from the leaf, or undo it with a negative loss."""
+        store = self.store
+        visits = 1 if loss > 0 else -1
+        while index != stop:
+            store.visits[index] += visits
+            store.wins[index] -= loss
+            index = store.parent[index]
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
\ No newline at end of file
@@ -0,0 +1,20 @@
+import chess
+
+NO_MOVE = 0
+
+
+def encode_move(move: chess.Move | None) -> int:
+    """
+    Pack a move into 16 bits: from square (6 bits), to square (6 bits) and
+    promotion piece type (3 bits). None and the null move encode as NO_MOVE.
+    """
+    if not move:
+        return NO_MOVE
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code: int) -> chess.Move | None:
+    """Inverse of encode_move; NO_MOVE decodes to None."""
+    if code == NO_MOVE:
+        return None
+    return chess.Move(code & 63, (code >> 6) & 63, (code >> 12) or None)
@@ -0,0 +1,172 @@
+"""
+Polyglot opening books built from our own games.
+
+The builder streams PGN files (such as the ones main.py and tournament.py
+write) and EPD files with bm operations, and counts every move played from
+positions before max_ply. A move weighs one per game it was played in, plus
+one more per game its side went on to win; games without a result count as
+draws. The entries are written in the Polyglot format, sorted by position
+key, so any Polyglot reader can use the book.
+
+Usage: python opening_book.py games.pgn [more.pgn positions.epd ...] [--output book.bin] [--max-ply 20] [--min-games 2]
+"""
+import argparse
+import os
+import struct
+from collections import defaultdict
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+DEFAULT_MAX_PLY = 20
+MAX_WEIGHT = 0xFFFF
+_ENTRY = struct.Struct(">QHHI")
+
+
+def polyglot_move(board: chess.Board, move: chess.Move) -> int:
+    """Polyglot encoding of a move; castling is written as the king taking its own rook."""
+    to_square = move.to_square
+    if board.is_castling(move):
+        to_square = chess.square(7 if board.is_kingside_castling(move) else 0, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return (chess.square_file(to_square) | chess.square_rank(to_square) << 3 | chess.square_file(move.from_square) << 6
+            | chess.square_rank(move.from_square) << 9 | promotion << 12)
+
+
+def _winner(game: chess.pgn.Game) -> chess.Color | None:
+    return {"1-0": chess.WHITE, "0-1": chess.BLACK}.get(game.headers.get("Result"))
+
+
+def _read_pgn(path, max_ply):
+    """Yield (board, move, won) for the mainline moves before max_ply of every game in a PGN file."""
+    with open(path, encoding="utf-8", errors="replace") as pgn_file:
+        while True:
+            game = chess.pgn.read_game(pgn_file)
+            if game is None:
+                break
+            winner = _winner(game)
+            board = game.board()
+            for move in game.mainline_moves():
+                if board.ply() >= max_ply:
+                    break
+                yield board, move, board.turn == winner
+                board.push(move)
+
+
+def _read_epd(path, max_ply):
+    """Yield (board, move, False) for the best moves (bm) of every position in an EPD file."""
+    with open(path) as epd_file:
+        for line in epd_file:
+            if not line.strip():
+                continue
+            board, operations = chess.Board.from_epd(line)
+            if board.ply() < max_ply:
+                for move in operations.get("bm", []):
+                    yield board, move, False
+
+
+def build_book(paths, output: str, max_ply: int = DEFAULT_MAX_PLY, min_games: int = 1) -> int:
+    """
+    Build a Polyglot book from PGN and EPD files (by extension) and write it
+    to output. Moves played in fewer than min_games games are left out.
+    Returns the number of entries written.
+    """
+    counts = defaultdict(lambda: [0, 0])
+    for path in paths:
+        read = _read_epd if path.lower().endswith(".epd") else _read_pgn
+        for board, move, won in read(path, max_ply):
+            count = counts[chess.polyglot.zobrist_hash(board), polyglot_move(board, move)]
+            count[0] += 1
+            count[1] += 1 + won
+
+    positions = defaultdict(list)
+    for (key, raw_move), (games, weight) in counts.items():
+        if games >= min_games:
+            positions[key].append((weight, raw_move))
+
+    entries = []
+    for key, moves in positions.items():
+        # Weights only compare moves of one position, so each position is
+        # scaled down on its own when its heaviest move does not fit.
+        heaviest = max(weight for weight, _ in moves)
+        scale = min(1.0, MAX_WEIGHT / heaviest)
+        for weight, raw_move in moves:
+            entries.append((key, -weight, raw_move, max(1, int(weight * scale))))
+    entries.sort()
+
+    with open(output + ".tmp", "wb") as book_file:
+        for key, _, raw_move, weight in entries:
+            book_file.write(_ENTRY.pack(key, raw_move, weight, 0))
+    os.replace(output + ".tmp", output)
+    return len(entries)
+
+
+class OpeningBook:
+    """
+    Polyglot book that players consult before searching.
+
+    The file is memory-mapped on first use. The book is picklable, so it can
+    be handed to worker processes, which open their own mapping.
+
+    Args:
+        path (str): Polyglot book file.
+        max_ply (int): Positions at or beyond this ply are not looked up.
+        randomize (bool): Pick among the book moves in proportion to their
+            weights instead of always playing the heaviest one.
+    """
+
+    def __init__(self, path: str, max_ply: int = DEFAULT_MAX_PLY, randomize: bool = True):
+        self.path = path
+        self.max_ply = max_ply
+        self.randomize = randomize
+        self.hits = 0
+        self.misses = 0
+        self._reader = None
+
+    def move(self, board: chess.Board) -> chess.Move | None:
+        """A legal book move for the position, or None if it is out of book."""
+        if board.ply() >= self.max_ply:
+            return None
+        if self._reader is None:
+            self._reader = chess.polyglot.open_reader(self.path)
+        try:
+            entry = self._reader.weighted_choice(board) if self.randomize else self._reader.find(board)
+        except IndexError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.move
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_reader"] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a Polyglot opening book from PGN and EPD files.")
+    parser.add_argument("paths", nargs="+", help="PGN files, or EPD files with bm operations")
+    parser.add_argument("--output", default=os.getenv("BOOK_PATH"), help="book file to write (default: BOOK_PATH)")
+    parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY, help="only moves played before this ply")
+    parser.add_argument("--min-games", type=int, default=1, help="leave out moves played in fewer games")
+    args = parser.parse_args()
+    if args.output is None:
+        parser.error("--output is required when BOOK_PATH is not set")
+    entries = build_book(args.paths, args.output, args.max_ply, args.min_games)
+    print(f"{entries} entries written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import multiprocessing
+import time
+
+import chess
+from algorithms import MAX_SEARCH_DEPTH, TIE_MARGIN, SearchAborted, SearchContext, alpha_beta, order_moves, tie_break_moves
+from incremental_eval import IncrementalBoard
+from position_cache import replay
+from search_stats import SearchStats
+from transposition import TranspositionTable
+
+_shared_alpha = None
+_worker_stop = None
+_worker_tt = None
+_worker_pruning = ()
+_worker_search_id = None
+
+
+def _init_worker(shared_alpha, stop_event, tt_size_mb, pruning):
+    global _shared_alpha, _worker_stop, _worker_tt, _worker_pruning
+    _shared_alpha = shared_alpha
+    _worker_stop = stop_event
+    _worker_pruning = pruning
+    _worker_tt = TranspositionTable(max_memory_mb=tt_size_mb)
+
+
+def _search_root_move(root_fen, move_stack, move_uci, depth, search_id, deadline):
+    """
+    Search one root move in a worker and publish its score as the new alpha.
+    Returns (score, nodes); the score is None if the deadline (time.monotonic())
+    passed or the search was stopped before it finished.
+    """
+    global _worker_search_id
+    if search_id != _worker_search_id:
+        _worker_tt.new_search()
+        _worker_search_id = search_id
+
+    board = replay(root_fen, move_stack, IncrementalBoard)
+
+    # Same window as algorithms.search_root: scores that can tie the best one
+    # stay exact, so the result matches the serial search.
+    best_eval = _shared_alpha.value
+    alpha = best_eval - TIE_MARGIN if best_eval < float('inf') else -float('inf')
+
+    time_limit = None
+    if deadline is not None:
+        time_limit = deadline - time.monotonic()
+        if time_limit <= 0:
+            return None, 0
+    search = SearchContext(time_limit=time_limit, stop_event=_worker_stop, pruning=_worker_pruning, shared_alpha=_shared_alpha)
+    board.push(chess.Move.from_uci(move_uci))
+    try:
+        eval = alpha_beta(board, depth - 1, alpha, float('inf'), False, _worker_tt, search)
+    except SearchAborted:
+        return None, search.nodes
+
+    with _shared_alpha.get_lock():
+        if eval > _shared_alpha.value:
+            _shared_alpha.value = eval
+    return eval, search.nodes
+
+
+class ParallelSearcher:
+    """
+    Root-parallel alpha-beta search on a process pool.
+
+    The best-ordered root move is searched first on its own, and the other
+    root moves are then searched concurrently with its score as alpha (young
+    brothers wait), so that they get cutoffs from the start. Each worker
+    receives the position as a FEN plus move stack and keeps its own
+    transposition table between moves. Workers share the best root score found
+    so far and re-read it every 64 nodes, so a search deep in one subtree
+    still picks up the bound another worker has just raised. At a fixed depth
+    they return the same move as the serial get_best_move_alpha_beta.
+
+    With a time_limit, the search deepens one ply at a time, starting each
+    iteration with the previous best move, and returns the best move of the
+    last iteration that every root move completed. stop() ends a search the
+    same way from another thread.
+
+    Args:
+        processes (int | None): Number of worker processes, defaults to the CPU count.
+        tt_size_mb (float): Transposition table size per worker.
+        pruning (Iterable[str]): Selective search methods, see algorithms.PRUNING_METHODS.
+        book (OpeningBook | None): Opening book consulted before every search.
+    """
+
+    def __init__(self, processes=None, tt_size_mb=64, pruning=(), book=None):
+        self.shared_alpha = multiprocessing.Value('d', -float('inf'))
+        self.stop_event = multiprocessing.Event()
+        self.pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                         initargs=(self.shared_alpha, self.stop_event, tt_size_mb, tuple(pruning)))
+        self.search_id = 0
+        self.book = book
+
+    def get_best_move(self, board: chess.Board, depth=None, time_limit=None, collect_stats=False):
+        """
+        The best move at the given depth or, with a time_limit (seconds), of
+        the deepest iteration completed in time, up to depth if given. With
+        collect_stats, a (move, SearchStats) pair is returned instead.
+        """
+        start = time.monotonic()
+        book_move = self.book.move(board) if self.book is not None else None
+        if book_move is not None:
+            return _with_stats(book_move, 0, 0, start, collect_stats, from_book=True)
+        if depth is None and time_limit is None:
+            raise ValueError("A depth or time_limit is required.")
+        self.search_id += 1
+        self.stop_event.clear()
+        legal_moves = list(board.legal_moves)
+        if time_limit is not None and len(legal_moves) == 1:
+            return _with_stats(legal_moves[0], 0, 0, start, collect_stats)
+
+        deadline = start + time_limit if time_limit is not None else None
+        depths = [depth] if time_limit is None else range(1, (depth or MAX_SEARCH_DEPTH) + 1)
+        root_moves = order_moves(board, legal_moves)
+        best_moves = root_moves[:1]
+        completed_depth = 0
+        nodes = 0
+        for current_depth in depths:
+            evals, iteration_nodes = self._search_iteration(board, root_moves, current_depth, deadline)
+            nodes += iteration_nodes
+            if evals is None:
+                break
+            best_eval = max(evals.values())
+            best_moves = [move for move in legal_moves if evals[move] == best_eval]
+            completed_depth = current_depth
+            root_moves.remove(best_moves[0])
+            root_moves.insert(0, best_moves[0])
+            if abs(best_eval) == float('inf'):
+                break
+
+        move = best_moves[0] if len(best_moves) == 1 else tie_break_moves(IncrementalBoard.from_board(board), best_moves)
+        return _with_stats(move, completed_depth, nodes, start, collect_stats)
+
+    def _search_iteration(self, board, root_moves, depth, deadline):
+        """Scores of every root move at depth and the nodes searched; the scores are None if the search ran out of time."""
+        self.shared_alpha.value = -float('inf')
+        root_fen = board.root().fen()
+        move_stack = [move.uci() for move in board.move_stack]
+
+        first = self.pool.apply(_search_root_move, (root_fen, move_stack, root_moves[0].uci(), depth, self.search_id, deadline))
+        if first[0] is None:
+            return None, first[1]
+        pending = {
+            move: self.pool.apply_async(_search_root_move, (root_fen, move_stack, move.uci(), depth, self.search_id, deadline))
+            for move in root_moves[1:]
+        }
+        results = {root_moves[0]: first}
+        results.update((move, result.get()) for move, result in pending.items())
+        nodes = sum(searched for _, searched in results.values())
+        if any(score is None for score, _ in results.values()):
+            return None, nodes
+        return {move: score for move, (score, _) in results.items()}, nodes
+
+    def stop(self) -> None:
+        """Make the current search return the best move found so far."""
+        self.stop_event.set()
+
+    def close(self) -> None:
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _with_stats(move, depth, nodes, start, collect_stats, from_book=False):
+    if not collect_stats:
+        return move
+    stats = SearchStats()
+    stats.book = from_book
+    stats.depth = depth
+    stats.nodes = nodes
+    stats.elapsed = time.monotonic() - start
+    return move, stats
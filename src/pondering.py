@@ -0,0 +1,148 @@
+import multiprocessing
+import queue
+
+import chess
+from algorithms import get_best_move_alpha_beta, principal_variation
+from position_cache import replay
+from transposition import TranspositionTable
+
+
+def _player_loop(commands, results, stop_event, search_done, tt_size_mb, pruning, book):
+    tt = TranspositionTable(max_memory_mb=tt_size_mb)
+    while True:
+        command = commands.get()
+        if command[0] == "quit":
+            break
+        # Results are sent as (result, exception), so that a failed command
+        # is raised in the parent instead of leaving it waiting.
+        try:
+            board = replay(command[1], command[2])
+
+            if command[0] == "search":
+                depth, time_limit, collect_stats = command[3], command[4], command[5]
+                result = get_best_move_alpha_beta(board, depth=depth, tt=tt, time_limit=time_limit, collect_stats=collect_stats,
+                                                  pruning=pruning, book=book)
+                if collect_stats:
+                    results.put(((result[0].uci(), result[1]), None))
+                else:
+                    results.put((result.uci(), None))
+            elif command[0] == "ponder":
+                # The reply is predicted from the principal variation our last
+                # search left in the table, and the position after it is searched
+                # until we are told to stop.
+                predicted = principal_variation(board, tt, 1)
+                if predicted:
+                    board.push(predicted[0])
+                    if not board.is_game_over():
+                        get_best_move_alpha_beta(board, tt=tt, stop_event=stop_event, pruning=pruning)
+                stop_event.wait()
+                results.put((predicted[0].uci() if predicted else None, None))
+        except Exception as error:
+            results.put((None, error))
+        if command[0] == "search":
+            search_done.set()
+
+
+class AlphaBetaPlayer:
+    """
+    Alpha-beta player running in a dedicated worker process.
+
+    The worker keeps one transposition table for the whole game. Between its
+    own moves it can ponder: it predicts the opponent's reply from the
+    principal variation and searches the resulting position on the
+    opponent's time. On a ponder hit the next search starts from a table that
+    already holds that work; on a miss the entries simply belong to an older
+    search generation and are replaced.
+
+    Args:
+        tt_size_mb (float): Transposition table size of the worker.
+        pruning (Iterable[str]): Selective search methods, see algorithms.PRUNING_METHODS.
+        book (OpeningBook | None): Opening book consulted before every search.
+    """
+
+    def __init__(self, tt_size_mb=64, pruning=(), book=None):
+        self.commands = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.search_done = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=_player_loop,
+            args=(self.commands, self.results, self.stop_event, self.search_done, tt_size_mb, tuple(pruning), book),
+            daemon=True,
+        )
+        self.process.start()
+        self.pondering = False
+        self.collect_stats = False
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+    def _send(self, kind, board, *args):
+        self.commands.put((kind, board.root().fen(), [move.uci() for move in board.move_stack], *args))
+
+    def start_search(self, board: chess.Board, depth=None, time_limit=None, collect_stats=False) -> None:
+        """Start searching the position; search_done is set once result() is available."""
+        self.stop_pondering()
+        self.search_done.clear()
+        self.collect_stats = collect_stats
+        self._send("search", board, depth, time_limit, collect_stats)
+
+    def _receive(self):
+        """The next result of the worker, raising its exception if the command failed."""
+        while True:
+            try:
+                result, error = self.results.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError(f"The alpha-beta worker exited with code {self.process.exitcode}.") from None
+        if error is not None:
+            raise error
+        return result
+
+    def result(self):
+        """The move of the last search, or (move, SearchStats) if it collected stats."""
+        result = self._receive()
+        if self.collect_stats:
+            return chess.Move.from_uci(result[0]), result[1]
+        return chess.Move.from_uci(result)
+
+    def get_best_move(self, board: chess.Board, depth=None, time_limit=None, collect_stats=False):
+        self.start_search(board, depth, time_limit, collect_stats)
+        return self.result()
+
+    def ponder(self, board: chess.Board) -> None:
+        """Ponder on the position after our move, with the opponent to move."""
+        self.stop_pondering()
+        self._send("ponder", board)
+        self.pondering = True
+
+    def stop_pondering(self, move: chess.Move | None = None) -> bool:
+        """Stop pondering and return whether move was the predicted reply."""
+        if not self.pondering:
+            return False
+        self.stop_event.set()
+        self.pondering = False
+        try:
+            predicted = self._receive()
+        finally:
+            self.stop_event.clear()
+        if move is None:
+            return False
+        hit = predicted == move.uci()
+        if hit:
+            self.ponder_hits += 1
+        else:
+            self.ponder_misses += 1
+        return hit
+
+    def close(self) -> None:
+        if self.process.is_alive():
+            self.stop_pondering()
+            self.commands.put(("quit",))
+            self.process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
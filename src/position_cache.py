@@ -0,0 +1,126 @@
+from collections import OrderedDict
+
+import chess
+from transposition import position_key
+
+
+def gives_check(board: chess.Board, move: chess.Move) -> bool:
+    """
+    Whether a legal move puts the opponent in check, computed from bitboards
+    instead of pushing the move, which is expensive on an IncrementalBoard.
+    """
+    king = board.king(not board.turn)
+    if king is None or board.is_castling(move) or board.is_en_passant(move):
+        return board.gives_check(move)
+
+    from_mask = chess.BB_SQUARES[move.from_square]
+    to_square = move.to_square
+    occupied = (board.occupied & ~from_mask) | chess.BB_SQUARES[to_square]
+    piece_type = move.promotion or board.piece_type_at(move.from_square)
+    if piece_type == chess.PAWN:
+        attacks = chess.BB_PAWN_ATTACKS[board.turn][to_square]
+    elif piece_type == chess.KNIGHT:
+        attacks = chess.BB_KNIGHT_ATTACKS[to_square]
+    else:
+        attacks = 0
+        if piece_type in (chess.BISHOP, chess.QUEEN):
+            attacks |= chess.BB_DIAG_ATTACKS[to_square][chess.BB_DIAG_MASKS[to_square] & occupied]
+        if piece_type in (chess.ROOK, chess.QUEEN):
+            attacks |= chess.BB_RANK_ATTACKS[to_square][chess.BB_RANK_MASKS[to_square] & occupied]
+            attacks |= chess.BB_FILE_ATTACKS[to_square][chess.BB_FILE_MASKS[to_square] & occupied]
+    if attacks & chess.BB_SQUARES[king]:
+        return True
+    # Any other attacker of the king was uncovered by the move.
+    return bool(board.attackers_mask(board.turn, king, occupied) & ~from_mask)
+
+
+def replay(root_fen: str, move_stack, board_class=chess.Board) -> chess.Board:
+    """
+    Rebuild a board sent to another process as its root FEN and UCI move list,
+    keeping the move history. board_class can be an IncrementalBoard.
+    """
+    board = board_class(root_fen)
+    for uci in move_stack:
+        board.push(chess.Move.from_uci(uci))
+    return board
+
+
+class PositionStatus:
+    """
+    Facts about a position that do not depend on how it was reached: the legal
+    moves, check, checkmate, stalemate and insufficient material. Which moves
+    give check is worked out on first use and kept as one bit per legal move.
+    """
+
+    __slots__ = ("legal_moves", "in_check", "checkmate", "stalemate", "insufficient_material", "_checks")
+
+    def __init__(self, board: chess.Board):
+        self.legal_moves = tuple(board.legal_moves)
+        self.in_check = board.is_check()
+        self.checkmate = self.in_check and not self.legal_moves
+        self.stalemate = not self.in_check and not self.legal_moves
+        self.insufficient_material = board.is_insufficient_material()
+        self._checks = None
+
+    def is_game_over(self, board: chess.Board) -> bool:
+        """Same result as board.is_game_over(); only the history-dependent rules are tested on the board."""
+        return (not self.legal_moves or self.insufficient_material
+                or board.is_seventyfive_moves() or board.is_fivefold_repetition())
+
+    def gives_check(self, board: chess.Board, move: chess.Move) -> bool:
+        if self._checks is None:
+            self._checks = 0
+            for bit, legal_move in enumerate(self.legal_moves):
+                if gives_check(board, legal_move):
+                    self._checks |= 1 << bit
+        return bool(self._checks >> self.legal_moves.index(move) & 1)
+
+
+class PositionCache:
+    """
+    Bounded cache of PositionStatus keyed by Zobrist hash, with LRU eviction
+    once max_entries is reached.
+
+    An entry takes roughly 2.5 KB, most of it the legal move list.
+
+    Args:
+        max_entries (int): Maximum number of positions kept.
+    """
+
+    def __init__(self, max_entries: int = 20_000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def status(self, board: chess.Board, key: int | None = None) -> PositionStatus:
+        """Status of the position; pass key if its Zobrist hash is already known."""
+        key = position_key(board) if key is None else key
+        status = self.entries.get(key)
+        if status is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return status
+        self.misses += 1
+        status = PositionStatus(board)
+        self.entries[key] = status
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return status
+
+    def legal_moves(self, board: chess.Board, key: int | None = None) -> tuple:
+        return self.status(board, key).legal_moves
+
+    def is_game_over(self, board: chess.Board, key: int | None = None) -> bool:
+        return self.status(board, key).is_game_over(board)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+default_position_cache = PositionCache()
@@ -0,0 +1,58 @@
+PHASES = ("select", "expand", "simulate", "backpropagate")
+
+
+class SearchStats:
+    """
+    Counters of one search, returned next to the move when a search is called
+    with collect_stats=True.
+
+    Alpha-beta fills nodes, cutoffs, evaluations and depth; MCTS fills
+    simulations, tree size, the Lc0 counters and the time spent in each
+    phase. Counters that do not apply to a search stay zero. book is set
+    when the move came from the opening book and nothing was searched.
+    """
+
+    def __init__(self):
+        self.book = False
+        self.nodes = 0
+        self.cutoffs = 0
+        self.evaluations = 0
+        self.depth = 0
+        self.simulations = 0
+        self.tree_size = 0
+        self.lc0_requests = 0
+        self.lc0_cache_hits = 0
+        self.elapsed = 0.0
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+
+    @property
+    def effective_branching_factor(self) -> float:
+        """Branching factor b for which b ** depth equals the number of nodes."""
+        if self.depth <= 0 or self.nodes <= 0:
+            return 0.0
+        return self.nodes ** (1 / self.depth)
+
+    @property
+    def lc0_cache_hit_rate(self) -> float:
+        return self.lc0_cache_hits / self.lc0_requests if self.lc0_requests else 0.0
+
+    def as_dict(self) -> dict:
+        values = {name: value for name, value in vars(self).items() if name != "phase_times"}
+        values.update({f"{phase}_time": seconds for phase, seconds in self.phase_times.items()})
+        values["effective_branching_factor"] = self.effective_branching_factor
+        values["lc0_cache_hit_rate"] = self.lc0_cache_hit_rate
+        return values
+
+    def pgn_comment(self) -> str:
+        """Short summary for a PGN move comment, leaving out counters that are zero."""
+        parts = ["book"] if self.book else []
+        if self.nodes:
+            parts.append(f"depth={self.depth} nodes={self.nodes} cutoffs={self.cutoffs} "
+                         f"evals={self.evaluations} ebf={self.effective_branching_factor:.2f}")
+        if self.simulations:
+            parts.append(f"sims={self.simulations} tree={self.tree_size}")
+            parts.append(" ".join(f"{phase}={seconds:.3f}s" for phase, seconds in self.phase_times.items()))
+        if self.lc0_requests:
+            parts.append(f"lc0={self.lc0_requests} lc0_hit_rate={self.lc0_cache_hit_rate:.0%}")
+        parts.append(f"time={self.elapsed:.3f}s")
+        return " ".join(parts)
@@ -1,4 +1,89 @@
+import random
+
 import chess
+import chess.polyglot
+
+PIECE_VALUES = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+    chess.KING: 0
+}
+
+_ADJACENT_FILES = [
+    (chess.BB_FILES[file - 1] if file > 0 else 0) | (chess.BB_FILES[file + 1] if file < 7 else 0)
+    for file in range(8)
+]
+
+# evaluate_board scores every opening ply differently (the early queen
+# penalty), then the middlegame and the endgame. Each stage gets a random
+# number that is mixed into the evaluation cache key.
+_STAGE_KEYS = [random.Random(stage).getrandbits(64) for stage in range(12)]
+
+
+class EvalCache:
+    """
+    Fixed-size table of scores keyed by a 64-bit hash. A slot keeps the entry
+    stored in it last.
+
+    Args:
+        size (int): Number of slots.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.keys = [None] * size
+        self.values = [None] * size
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key: int):
+        index = key % self.size
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.values[index]
+        self.misses += 1
+        return None
+
+    def store(self, key: int, value) -> None:
+        index = key % self.size
+        self.keys[index] = key
+        self.values[index] = value
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        self.keys = [None] * self.size
+        self.values = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+
+
+# Pawn structure scores by pawn_key, and full evaluations by evaluation_key.
+pawn_hash = EvalCache(1 << 14)
+eval_cache = EvalCache(1 << 17)
+
+
+def pawn_key(board: chess.Board) -> int:
+    """Zobrist key of the pawns alone: the pawn part of the polyglot hash."""
+    key = 0
+    for color in chess.COLORS:
+        # Polyglot numbers black pawns 0 and white pawns 1.
+        offset = 64 * color
+        for square in chess.scan_forward(board.pawns & board.occupied_co[color]):
+            key ^= chess.polyglot.POLYGLOT_RANDOM_ARRAY[offset + square]
+    return key
+
+
+def evaluation_key(zobrist: int, move_count: int) -> int:
+    """Key of a position's evaluate_board score in eval_cache, from its Zobrist hash and ply."""
+    stage = move_count if move_count < 10 else 10 if move_count < 30 else 11
+    return zobrist ^ _STAGE_KEYS[stage]
 
 def evaluate_board(board: chess.Board) -> int:
     """Evaluate the board state."""
@@ -42,6 +127,7 @@ def evaluate_middlegame(board: chess.Board) -> int:
     value -= evaluate_activity(board, chess.BLACK) * 0.3
     value += evaluate_king_safety(board, chess.WHITE) * 0.3
     value -= evaluate_king_safety(board, chess.BLACK) * 0.3
+    value += evaluate_pawn_structure(board)
     return value
 
 def evaluate_endgame(board: chess.Board) -> int:
@@ -51,18 +137,11 @@ def evaluate_endgame(board: chess.Board) -> int:
     value -= evaluate_king_activity(board, chess.BLACK) * 0.3
     value += evaluate_pawn_advancement(board, chess.WHITE) * 0.4
     value -= evaluate_pawn_advancement(board, chess.BLACK) * 0.4
+    value += evaluate_pawn_structure(board)
     return value
 
 def evaluate_material(board: chess.Board) -> int | float:
     """Evaluate material balance on the board."""
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0 
-    }
     value = 0
 
     if board.is_checkmate():
@@ -71,7 +150,7 @@ def evaluate_material(board: chess.Board) -> int | float:
         return 0
 
     # Material evaluation
-    for piece_type, piece_value in piece_values.items():
+    for piece_type, piece_value in PIECE_VALUES.items():
         value += len(board.pieces(piece_type, chess.WHITE)) * piece_value
         value -= len(board.pieces(piece_type, chess.BLACK)) * piece_value
 
@@ -166,6 +245,20 @@ def evaluate_pawn_advancement(board: chess.Board, color: chess.Color) -> int | f
         advancement_score += rank if color == chess.WHITE else (7 - rank)
     return advancement_score * 0.1
 
+def evaluate_pawn_structure(board: chess.Board, key: int | None = None) -> int | float:
+    """
+    White's pawn structure score minus Black's. It depends on the pawns
+    alone, so the scores of both colors are cached in pawn_hash under the
+    pawn-only Zobrist key, which callers that keep it up to date can pass in.
+    """
+    if key is None:
+        key = pawn_key(board)
+    scores = pawn_hash.probe(key)
+    if scores is None:
+        scores = (evaluate_positional_heuristics(board, chess.BLACK), evaluate_positional_heuristics(board, chess.WHITE))
+        pawn_hash.store(key, scores)
+    return scores[chess.WHITE] - scores[chess.BLACK]
+
 def evaluate_positional_heuristics(board: chess.Board, color: chess.Color) -> int | float:
     """Evaluate pawn structure and other positional factors."""
     positional_score = 0
@@ -175,32 +268,27 @@ def evaluate_positional_heuristics(board: chess.Board, color: chess.Color) -> in
     return positional_score
 
 def is_isolated_pawn(board: chess.Board, square: chess.Square, color: chess.Color) -> int | float:
-    """Check if a pawn is isolated."""
-    file = chess.square_file(square)
-    adjacent_files = [file - 1, file + 1]
-    for adj_file in adjacent_files:
-        if 0 <= adj_file <= 7:
-            for rank in range(8):
-                adj_square = chess.square(adj_file, rank)
-                if board.piece_at(adj_square) == chess.PAWN and board.color_at(adj_square) == color:
-                    return 0
-    return 1
+    """Check if a pawn has no friendly pawn on an adjacent file."""
+    own_pawns = board.pawns & board.occupied_co[color]
+    return 0 if own_pawns & _ADJACENT_FILES[chess.square_file(square)] else 1
 
 def is_backward_pawn(board: chess.Board, square: chess.Square, color: chess.Color) -> int | float:
-    """Check if a pawn is backward."""
+    """
+    Check if a pawn is backward: no friendly pawn beside it, and its advance
+    square is blocked by a pawn or attacked by an enemy pawn.
+    """
     file = chess.square_file(square)
     rank = chess.square_rank(square)
-    direction = 1 if color == chess.WHITE else -1
-
-    for adj_file in [file - 1, file + 1]:
-        if 0 <= adj_file <= 7:
-            adj_square = chess.square(adj_file, rank)
-            if board.piece_at(adj_square) == chess.PAWN and board.color_at(adj_square) == color:
-                return 0
+    own_pawns = board.pawns & board.occupied_co[color]
+    if own_pawns & _ADJACENT_FILES[file] & chess.BB_RANKS[rank]:
+        return 0
 
-    forward_square = chess.square(file, rank + direction)
-    if 0 <= chess.square_rank(forward_square) <= 7:
-        if board.piece_at(forward_square) is None and not board.is_attacked_by(not color, forward_square):
+    forward_rank = rank + (1 if color == chess.WHITE else -1)
+    if 0 <= forward_rank <= 7:
+        forward_square = chess.square(file, forward_rank)
+        enemy_pawns = board.pawns & board.occupied_co[not color]
+        blocked = board.pawns & chess.BB_SQUARES[forward_square]
+        if not blocked and not enemy_pawns & chess.BB_PAWN_ATTACKS[color][forward_square]:
             return 0
     return 1
 
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Minimal deterministic UCI engine used in place of Lc0 for local runs and
+benchmarks.
+
+The reported score of a position is its material balance in centipawns from
+the side to move plus a small fixed offset derived from the position, so the
+same position always gets the same score at any depth. With MultiPV each root
+move is scored as the negated score of the position it leads to, which matches
+analysing that child position directly.
+
+Usage: python stub_engine.py [--crash-after=N] [--hang-after=N] [ignored engine arguments]
+
+--crash-after and --hang-after make the engine exit, or stop answering, at
+its N-th "go" command, to test how callers handle broken engines.
+"""
+import sys
+import zlib
+
+import chess
+
+from state_eval import PIECE_VALUES
+
+MATE_SCORE = "mate"
+
+
+def score_position(board: chess.Board) -> int:
+    """Centipawn score of the position from the side to move."""
+    material = 0
+    for piece_type, piece_value in PIECE_VALUES.items():
+        material += len(board.pieces(piece_type, board.turn)) * piece_value
+        material -= len(board.pieces(piece_type, not board.turn)) * piece_value
+    offset = zlib.crc32(board.board_fen().encode()) % 21 - 10
+    return material * 100 + offset
+
+
+def score_move(board: chess.Board, move: chess.Move) -> tuple[str, int]:
+    """UCI score of a root move as (kind, value) from the side to move."""
+    board.push(move)
+    try:
+        if board.is_checkmate():
+            return MATE_SCORE, 1
+        if board.is_game_over():
+            return "cp", 0
+        return "cp", -score_position(board)
+    finally:
+        board.pop()
+
+
+def parse_position(tokens: list[str]) -> chess.Board:
+    if tokens[0] == "startpos":
+        board = chess.Board()
+        rest = tokens[1:]
+    else:
+        fen_end = tokens.index("moves") if "moves" in tokens else len(tokens)
+        board = chess.Board(" ".join(tokens[1:fen_end]))
+        rest = tokens[fen_end:]
+    if rest and rest[0] == "moves":
+        for uci in rest[1:]:
+            board.push_uci(uci)
+    return board
+
+
+def go(board: chess.Board, tokens: list[str], multipv: int) -> list[str]:
+    depth = int(tokens[tokens.index("depth") + 1]) if "depth" in tokens else 1
+    if board.is_game_over():
+        if board.is_checkmate():
+            return ["info depth 0 score mate 0", "bestmove (none)"]
+        return ["info depth 0 score cp 0", "bestmove (none)"]
+
+    scored = [(score_move(board, move), move) for move in board.legal_moves]
+    scored.sort(key=lambda item: (item[0][0] == MATE_SCORE, item[0][1] if item[0][0] != MATE_SCORE else -item[0][1]), reverse=True)
+
+    if multipv <= 1:
+        lines = [f"info depth {depth} seldepth {depth} multipv 1 score cp {score_position(board)} nodes {len(scored)} pv {scored[0][1].uci()}"]
+    else:
+        lines = [
+            f"info depth {depth} seldepth {depth} multipv {index} score {kind} {value} nodes {len(scored)} pv {move.uci()}"
+            for index, ((kind, value), move) in enumerate(scored[:multipv], start=1)
+        ]
+    lines.append(f"bestmove {scored[0][1].uci()}")
+    return lines
+
+
+def parse_fault(name: str) -> int | None:
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return int(arg[len(prefix):])
+    return None
+
+
+def main():
+    board = chess.Board()
+    multipv = 1
+    crash_after = parse_fault("crash-after")
+    hang_after = parse_fault("hang-after")
+    searches = 0
+
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == "uci":
+            output = [
+                "id name StubEngine",
+                "id author chess_ai",
+                "option name MultiPV type spin default 1 min 1 max 500",
+                "uciok",
+            ]
+        elif command == "isready":
+            output = ["readyok"]
+        elif command == "setoption" and "name" in tokens and "value" in tokens:
+            name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")])
+            if name.lower() == "multipv":
+                multipv = int(tokens[tokens.index("value") + 1])
+            output = []
+        elif command == "ucinewgame":
+            board = chess.Board()
+            output = []
+        elif command == "position":
+            board = parse_position(tokens[1:])
+            output = []
+        elif command == "go":
+            searches += 1
+            if searches == crash_after:
+                sys.exit(1)
+            if searches == hang_after:
+                output = []
+                continue
+            output = go(board, tokens[1:], multipv)
+        elif command == "quit":
+            break
+        else:
+            output = []
+
+        for out in output:
+            sys.stdout.write(out + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
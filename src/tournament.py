@@ -0,0 +1,143 @@
+"""
+Play many AI vs AI games concurrently and stream them to PGN.
+
+Every worker process opens one engine and one Lc0 cache and keeps them for
+all the games it plays. Finished games are written as soon as they arrive,
+either appended to a single PGN file or as one file per game, under the save
+directory. With --format binary they are appended to a store of binary game
+records instead (see game_store.py), named after the output file. Games
+whose Round is already in the output are skipped, so an interrupted run
+continues where it stopped.
+
+Usage: python tournament.py GAMES [--concurrency N] [--save-dir DIR] [--output FILE | --shard] [--format pgn|binary]
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+
+import chess.pgn
+from game_store import EXTENSION, GameWriter, encode_game, stored_rounds
+from main import OUTPUT_FORMATS, open_engine, open_lc0_cache, play_game, save_dir
+
+_engine = None
+_lc0_cache = None
+
+
+def _close_worker():
+    if _engine is not None:
+        _engine.quit()
+    if _lc0_cache is not None:
+        _lc0_cache.close()
+
+
+def _init_worker():
+    global _engine, _lc0_cache
+    _engine = open_engine()
+    _lc0_cache = open_lc0_cache()
+    # atexit does not run in pool workers; multiprocessing finalizers do.
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _play(game_index, output_format):
+    game = play_game(game_index, _engine, _lc0_cache, verbose=False)
+    return game_index, encode_game(game) if output_format == "binary" else str(game)
+
+
+def completed_rounds(pgn_path: str) -> set[int]:
+    """Round numbers of the games already in a PGN file."""
+    rounds = set()
+    if not os.path.exists(pgn_path):
+        return rounds
+    with open(pgn_path) as pgn_file:
+        while (headers := chess.pgn.read_headers(pgn_file)) is not None:
+            if headers.get("Round", "").isdigit():
+                rounds.add(int(headers["Round"]))
+    return rounds
+
+
+def completed_shards(save_directory: str) -> set[int]:
+    """Game indices of the game_{index}.pgn files in the directory."""
+    rounds = set()
+    if not os.path.isdir(save_directory):
+        return rounds
+    for name in os.listdir(save_directory):
+        index = name[len("game_"):-len(".pgn")]
+        if name.startswith("game_") and name.endswith(".pgn") and index.isdigit():
+            rounds.add(int(index))
+    return rounds
+
+
+def run_tournament(games: int, concurrency: int, save_directory: str, output: str = "tournament.pgn", shard: bool = False,
+                   output_format: str = "pgn"):
+    """
+    Play games 1..games on a pool of concurrency worker processes, skipping the
+    ones already saved, and return the indices of the games that failed.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+    if shard and output_format == "binary":
+        raise ValueError("Binary game records are always written to a single store.")
+    os.makedirs(save_directory, exist_ok=True)
+    pgn_path = os.path.join(save_directory, output)
+    store_path = os.path.splitext(pgn_path)[0] + EXTENSION
+    if output_format == "binary":
+        done = stored_rounds(store_path)
+    else:
+        done = completed_shards(save_directory) if shard else completed_rounds(pgn_path)
+    pending = [index for index in range(1, games + 1) if index not in done]
+    print(f"{len(done & set(range(1, games + 1)))} of {games} games already played, {len(pending)} to go.")
+
+    failed = []
+    writer = GameWriter(store_path) if output_format == "binary" else None
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=_init_worker) as executor:
+        futures = {executor.submit(_play, index, output_format): index for index in pending}
+        for finished, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                _, game = future.result()
+            except Exception as error:
+                print(f"Game {index} failed: {error!r}")
+                failed.append(index)
+                continue
+
+            if writer is not None:
+                writer.append_encoded(game)
+            elif shard:
+                path = os.path.join(save_directory, f"game_{index}.pgn")
+                with open(path + ".tmp", "w") as pgn_file:
+                    pgn_file.write(game + "\n")
+                os.replace(path + ".tmp", path)
+            else:
+                with open(pgn_path, "a") as pgn_file:
+                    pgn_file.write(game + "\n\n")
+                    pgn_file.flush()
+                    os.fsync(pgn_file.fileno())
+            print(f"Game {index} finished ({finished}/{len(pending)})")
+    if writer is not None:
+        writer.close()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play AI vs AI games concurrently.")
+    parser.add_argument("games", type=int, help="number of games to play")
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--save-dir", default=save_dir, help="output directory (default: SAVE_DIR)")
+    parser.add_argument("--output", default="tournament.pgn", help="PGN file the games are appended to")
+    parser.add_argument("--shard", action="store_true", help="write one game_{index}.pgn per game instead")
+    parser.add_argument("--format", default="pgn", choices=OUTPUT_FORMATS,
+                        help="binary appends compact game records to OUTPUT with the .grec extension")
+    args = parser.parse_args()
+    if args.save_dir is None:
+        parser.error("--save-dir is required when SAVE_DIR is not set")
+    if args.shard and args.format == "binary":
+        parser.error("--shard cannot be used with --format binary")
+
+    failed = run_tournament(args.games, args.concurrency, args.save_dir, args.output, args.shard, args.format)
+    if failed:
+        print(f"{len(failed)} games failed: {sorted(failed)}. Run again to retry them.")
+
+
+if __name__ == "__main__":
+    main()
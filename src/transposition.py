@@ -0,0 +1,78 @@
+import chess
+import chess.polyglot
+from incremental_eval import IncrementalBoard
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Rough footprint of one slotted entry plus its list slot, used to turn a
+# memory cap into a number of table slots.
+ENTRY_SIZE_BYTES = 128
+
+
+def position_key(board: chess.Board) -> int:
+    """Zobrist key used to index search tables."""
+    if isinstance(board, IncrementalBoard):
+        return board.zobrist_hash()
+    return chess.polyglot.zobrist_hash(board)
+
+
+class TTEntry:
+    __slots__ = ("key", "depth", "score", "bound", "move", "generation")
+
+    def __init__(self, key, depth, score, bound, move, generation):
+        self.key = key
+        self.depth = depth
+        self.score = score
+        self.bound = bound
+        self.move = move
+        self.generation = generation
+
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table keyed by Zobrist hash.
+
+    Each slot holds a single entry. A new result replaces the stored one if the
+    slot is empty, the stored entry comes from an earlier search, or the new
+    result was searched at least as deep (depth-preferred with aging).
+
+    Args:
+        max_memory_mb (float): Approximate memory cap for the table.
+    """
+
+    def __init__(self, max_memory_mb: float = 64):
+        self.size = max(1, int(max_memory_mb * 1024 * 1024) // ENTRY_SIZE_BYTES)
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def new_search(self) -> None:
+        """Age the table so entries from previous moves become replaceable."""
+        self.generation += 1
+
+    def probe(self, key: int) -> TTEntry | None:
+        entry = self.entries[key % self.size]
+        if entry is not None and entry.key == key:
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, move: chess.Move | None) -> None:
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is None:
+            self.entries[index] = TTEntry(key, depth, score, bound, move, self.generation)
+            return
+        if entry.generation != self.generation or depth >= entry.depth:
+            # Keep the old best move for ordering if this result has none.
+            if move is not None or entry.key != key:
+                entry.move = move
+            entry.key = key
+            entry.depth = depth
+            entry.score = score
+            entry.bound = bound
+            entry.generation = self.generation
+
+    def clear(self) -> None:
+        self.entries = [None] * self.size
+        self.generation = 0
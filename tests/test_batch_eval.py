@@ -0,0 +1,47 @@
+import random
+
+import chess
+import numpy as np
+from batch_eval import evaluate_boards
+from state_eval import evaluate_board
+
+
+def _random_game_positions(rng, games, max_plies):
+    boards = []
+    for _ in range(games):
+        board = chess.Board()
+        while not board.is_game_over() and board.ply() < max_plies:
+            board.push(rng.choice(list(board.legal_moves)))
+            boards.append(board.copy())
+    return boards
+
+
+def _assert_matches(boards):
+    expected = np.array([evaluate_board(board) for board in boards], dtype=np.float64)
+    # isclose treats infinities of the same sign as equal, so mates are compared too.
+    assert np.isclose(evaluate_boards(boards), expected).all()
+
+
+def test_batch_matches_full_evaluation_over_random_games():
+    boards = _random_game_positions(random.Random(1), 30, 120)
+    # evaluate_board switches at ply 10 and 30; every stage must be covered.
+    plies = [len(board.move_stack) for board in boards]
+    assert min(plies) < 10 and any(10 <= ply < 30 for ply in plies) and max(plies) >= 30
+    _assert_matches(boards)
+
+
+def test_batch_matches_full_evaluation_on_game_over_positions():
+    boards = []
+    for moves in (
+        ["f3", "e5", "g4", "Qh4"],  # Fool's mate, White is mated
+        ["e4", "e5", "Qh5", "Nc6", "Bc4", "Nf6", "Qxf7"],  # Scholar's mate, Black is mated
+        ["e3", "a5", "Qh5", "Ra6", "Qxa5", "h5", "h4", "Rah6", "Qxc7", "f6", "Qxd7+", "Kf7",
+         "Qxb7", "Qd3", "Qxb8", "Qh7", "Qxc8", "Kg6", "Qe6"],  # Sam Loyd's ten-move stalemate
+    ):
+        board = chess.Board()
+        for san in moves:
+            board.push_san(san)
+        boards.append(board)
+    assert [board.is_checkmate() for board in boards] == [True, True, False]
+    assert boards[2].is_stalemate()
+    _assert_matches(boards)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import chess
+import chess.engine
+import pytest
+from engine_pool import EnginePool
+
+STUB_ENGINE = os.path.join(os.path.dirname(__file__), os.pardir, "src", "stub_engine.py")
+LIMIT = chess.engine.Limit(nodes=1)
+
+
+@pytest.mark.parametrize("fault", ["--crash-after=2", "--hang-after=2"])
+def test_broken_engine_is_restarted(fault):
+    # Every engine process fails at its second search, so the second request
+    # only succeeds on a restarted engine.
+    with EnginePool([sys.executable, STUB_ENGINE, fault], timeout=2.0) as pool:
+        board = chess.Board()
+        first = pool.analyse(board, LIMIT)
+        second = pool.analyse(board, LIMIT)
+        assert pool.restarts == 1
+        assert second["score"] == first["score"]
+        assert second["pv"] == first["pv"]
@@ -0,0 +1,32 @@
+import random
+
+import chess
+import chess.polyglot
+from incremental_eval import IncrementalBoard
+from state_eval import evaluate_board, pawn_key
+
+
+def _check(board: IncrementalBoard):
+    # evaluate_board scores from scratch, using the move stack for the game stage.
+    assert board.evaluate() == evaluate_board(board)
+    assert board.zobrist_hash() == chess.polyglot.zobrist_hash(board)
+    assert board.pawn_key() == pawn_key(board)
+
+
+def test_incremental_matches_full_evaluation_over_random_games():
+    rng = random.Random(1)
+    for _ in range(40):
+        board = IncrementalBoard()
+        _check(board)
+        while not board.is_game_over() and board.ply() < 120:
+            board.push(rng.choice(list(board.legal_moves)))
+            _check(board)
+            # Undo and redo now and then, so pop() is checked as well.
+            if rng.random() < 0.2:
+                move = board.pop()
+                _check(board)
+                board.push(move)
+                _check(board)
+        while board.move_stack:
+            board.pop()
+            _check(board)
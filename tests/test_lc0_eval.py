@@ -0,0 +1,43 @@
+import os
+import sys
+
+import chess
+import chess.engine
+import pytest
+from lc0_eval import get_lc0_move_evaluations, get_lc0_multipv_evaluations
+from stub_engine import score_move
+
+STUB_ENGINE = [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "stub_engine.py")]
+FEN = "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5Q2/PPPP1PPP/RNB1K1NR w KQkq - 2 3"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = chess.engine.SimpleEngine.popen_uci(STUB_ENGINE)
+    yield engine
+    engine.quit()
+
+
+def test_multipv_lists_every_move_best_first(engine):
+    board = chess.Board(FEN)
+    infos = engine.analyse(board, chess.engine.Limit(depth=2), multipv=board.legal_moves.count())
+
+    assert len(infos) == board.legal_moves.count()
+    assert [info["multipv"] for info in infos] == list(range(1, len(infos) + 1))
+    assert {info["pv"][0] for info in infos} == set(board.legal_moves)
+    scores = [info["score"].relative.score(mate_score=100000) for info in infos]
+    assert scores == sorted(scores, reverse=True)
+    for info in infos:
+        kind, value = score_move(board, info["pv"][0])
+        expected = chess.engine.Mate(value) if kind == "mate" else chess.engine.Cp(value)
+        assert info["score"].relative == expected
+
+
+@pytest.mark.parametrize("fen", [FEN, "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+                                 "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"])
+def test_multipv_scores_match_per_move_analysis(engine, fen):
+    board = chess.Board(fen)
+    is_black = board.turn == chess.BLACK
+    multipv = get_lc0_multipv_evaluations(engine, fen, is_black)
+    assert multipv == get_lc0_move_evaluations(engine, fen, is_black)
+    assert list(multipv) == list(board.legal_moves)
@@ -0,0 +1,31 @@
+import chess
+import pytest
+from algorithms import get_best_move_alpha_beta
+from parallel_search import ParallelSearcher
+
+FENS = [
+    chess.STARTING_FEN,
+    "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4",
+    "8/5k2/8/3KP3/8/8/8/8 w - - 0 1",
+]
+
+
+@pytest.fixture(scope="module")
+def searcher():
+    with ParallelSearcher(processes=2, tt_size_mb=4) as searcher:
+        yield searcher
+
+
+@pytest.mark.parametrize("fen", FENS)
+def test_fixed_depth_matches_serial_search(searcher, fen):
+    board = chess.Board(fen)
+    assert searcher.get_best_move(board, depth=3) == get_best_move_alpha_beta(board, depth=3)
+
+
+def test_time_limit_returns_the_last_completed_iteration(searcher):
+    board = chess.Board(FENS[1])
+    move, stats = searcher.get_best_move(board, time_limit=0.5, collect_stats=True)
+    assert move in board.legal_moves
+    # Qxf7 mates, which ends the deepening early.
+    assert move == chess.Move.from_uci("h5f7")
+    assert stats.depth >= 1 and stats.elapsed < 2
@@ -0,0 +1,19 @@
+import chess
+import pytest
+from opening_book import OpeningBook
+from pondering import AlphaBetaPlayer
+
+
+def test_worker_exception_is_raised_in_the_parent(tmp_path):
+    with AlphaBetaPlayer(tt_size_mb=1, book=OpeningBook(str(tmp_path / "missing.bin"))) as player:
+        with pytest.raises(FileNotFoundError):
+            player.get_best_move(chess.Board(), depth=1)
+        assert player.search_done.is_set()
+
+
+def test_dead_worker_is_reported():
+    with AlphaBetaPlayer(tt_size_mb=1) as player:
+        player.process.kill()
+        player.process.join()
+        with pytest.raises(RuntimeError):
+            player.get_best_move(chess.Board(), depth=1)